@@ -1,12 +1,12 @@
 import pygame
 
+from src.assets import assets
 from src.game import Game
 from src.menu import MainMenu, PauseMenu
-from src.platform import FinishPlatform, Platform
 from src.player import Player
-from src.shaders import ps1_shader
+from src.shaders import display_session, ps1_shader
 from src.sound_manager import SoundManager
-from src.utils import safe_sprite_load
+from src.spatial_grid import SpatialGroup
 
 
 pygame.init()
@@ -33,11 +33,18 @@ sounds = {
 	'victory': 'assets/sounds/victory.wav',
 }
 
+LEVEL_PATH = 'assets/levels/level_1.lvl'
+
+# seconds of play F5 can step back through
+REWIND_SECONDS = 10.0
+
+
 @ps1_shader(
 	resolution_scale=0.003,
 	jitter_strength=0.15,
 	fog_density=0.2,
 	fog_color=(0.35, 0.35, 0.43),
+	low_res=True,
 )
 class StyledGame(Game):
 	def __init__(self, *args, **kwargs):
@@ -46,57 +53,53 @@ class StyledGame(Game):
 		self._paused = False
 
 
-def create_game(sound_manager):
-	platform_group = pygame.sprite.Group()
-
-	game = StyledGame(
+def create_game(
+	sound_manager,
+	level_path=LEVEL_PATH,
+	size=None,
+	game_class=StyledGame,
+	streaming=True,
+	physics_hz=60,
+	simulation_only=False,
+	rewind_seconds=0.0,
+):
+	level = assets.get_level(level_path)
+	platform_group = SpatialGroup()
+
+	game = game_class(
 		player=None,
 		platform_group=platform_group,
 		title='Раз, два, взяли',
-		size=(SCREEN_WIDTH, SCREEN_HEIGHT),
+		size=size or (SCREEN_WIDTH, SCREEN_HEIGHT),
 		bg='#1a1a1a',
 		fps=60,
 		show_fps=False,
-		gravity=(0, -50),
+		gravity=level.gravity,
 		physics_ppm=20,
 		use_camera=True,
 		sound_manager=sound_manager,
-		death_zone_y=-30,
-		enable_snow=True,
-		snow_density=500,
+		death_zone_y=level.death_zone_y,
+		enable_snow=level.enable_snow,
+		snow_density=level.snow_density,
+		physics_hz=physics_hz,
+		simulation_only=simulation_only,
+		rewind_seconds=rewind_seconds,
 	)
 
-	platform_group.add(Platform(game.physics_world, (80, 280), (160, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (440, 280), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (600, 280), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (760, 280), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1080, 280), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1320, 280), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1560, 280), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1800, 440), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1960, 440), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (2200, 520), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (2440, 680), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (2200, 1080), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1400, 1160), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1640, 1160), (80, 80), '#404040'))
-	platform_group.add(Platform(game.physics_world, (1960, 1160), (80, 80), '#404040'))
-	finish_platform = FinishPlatform(game.physics_world, (760, 1240), (80, 80))
-	platform_group.add(finish_platform)
-	platform_group.add(Platform(game.physics_world, (1080, 1240), (80, 80), '#404040'))
-
-	start_pos = (80.0, 200.0)
-	game.set_finish_platform(finish_platform)
-
-	left_texture_left = safe_sprite_load(textures['player_left_1'])
-	left_texture_right = safe_sprite_load(textures['player_left_2'])
-	right_texture_left = safe_sprite_load(textures['player_right_2'])
-	right_texture_right = safe_sprite_load(textures['player_right_1'])
-	bag_texture = safe_sprite_load(textures['courier_bag'])
+	game.load_level(level, streaming=streaming)
+
+	if simulation_only:
+		left_texture_left = left_texture_right = right_texture_left = right_texture_right = bag_texture = None
+	else:
+		left_texture_left = assets.get_image(textures['player_left_1'])
+		left_texture_right = assets.get_image(textures['player_left_2'])
+		right_texture_left = assets.get_image(textures['player_right_2'])
+		right_texture_right = assets.get_image(textures['player_right_1'])
+		bag_texture = assets.get_image(textures['courier_bag'])
 
 	player = Player(
 		physics_world=game.physics_world,
-		position=start_pos,
+		position=level.spawn,
 		size=50,
 		speed=10,
 		jump_force=85,
@@ -113,7 +116,10 @@ def create_game(sound_manager):
 
 
 def run_game(sound_manager):
-	game = create_game(sound_manager)
+	for name, path in sounds.items():
+		sound_manager.set_sound(name, assets.get_sound(path))
+
+	game = create_game(sound_manager, rewind_seconds=REWIND_SECONDS)
 	clock = pygame.time.Clock()
 	running = True
 	result = 'quit'
@@ -135,6 +141,7 @@ def run_game(sound_manager):
 					else:
 						game._paused = False
 						game._pause_menu = None
+						game.reset_timestep()
 
 				elif event.key == pygame.K_m and (game._is_game_over or game._is_victory):
 					running = False
@@ -161,9 +168,11 @@ def run_game(sound_manager):
 				if pause_action == 'resume':
 					game._paused = False
 					game._pause_menu = None
+					game.reset_timestep()
 				elif pause_action == 'restart':
-					running = False
-					result = 'restart'
+					game._paused = False
+					game._pause_menu = None
+					game.reset()
 				elif pause_action == 'menu':
 					running = False
 					result = 'menu'
@@ -174,29 +183,26 @@ def run_game(sound_manager):
 		game.render()
 		clock.tick(game._fps)
 
-	if hasattr(game, '_shader_effect'):
-		game._shader_effect.cleanup()
-
-	pygame.display.quit()
-
+	# the window and the GL context stay open for the menu or the next run
 	return result
 
 
 def main() -> None:
 	sound_manager = SoundManager()
-	for name, path in sounds.items():
-		sound_manager.load_sound(name, path)
+	# decoded while the menu is shown, and kept for every later run
+	assets.preload(images=textures.values(), sounds=sounds.values(), levels=(LEVEL_PATH,))
 
 	state = 'menu'
 
 	while state != 'quit':
 		if state == 'menu':
-			menu = MainMenu((SCREEN_WIDTH, SCREEN_HEIGHT))
+			menu = MainMenu((SCREEN_WIDTH, SCREEN_HEIGHT), session=display_session)
 			state = menu.run()
-			pygame.display.quit()
 		elif state == 'start' or state == 'restart':
 			state = run_game(sound_manager)
 
+	display_session.close()
+	assets.shutdown()
 	pygame.quit()
 
 
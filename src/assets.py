@@ -0,0 +1,109 @@
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pygame
+
+from .level import Level, load_level
+from .utils import is_file_valid
+
+
+def _decode_image(path: str) -> pygame.Surface | None:
+	if not is_file_valid(path):
+		return None
+	return pygame.image.load(path)
+
+
+def _decode_sound(path: str) -> pygame.mixer.Sound | None:
+	try:
+		return pygame.mixer.Sound(path)
+	except pygame.error as e:
+		print(f'Warning: Could not load sound {path}: {e}')
+		return None
+
+
+class AssetManager:
+	"""process-wide cache of decoded images, sounds and levels.
+
+	`preload` decodes files on a thread pool, the getters wait for a pending
+	decode or start one on the calling thread. Images are converted to the
+	display format the first time they are requested with a display set up.
+	Scaled copies of surfaces are cached as well, keyed by the source surface
+	"""
+
+	def __init__(self, max_workers: int = 4) -> None:
+		self._max_workers = max_workers
+		self._executor = None
+		self._images = {}
+		self._converted = {}
+		self._sounds = {}
+		self._levels = {}
+		self._scaled = {}
+
+	def _submit(self, cache: dict, path: str, decode) -> None:
+		if path in cache:
+			return
+		if self._executor is None:
+			self._executor = ThreadPoolExecutor(self._max_workers, thread_name_prefix='assets')
+		cache[path] = self._executor.submit(decode, path)
+
+	def preload(
+		self,
+		images: Iterable[str] = (),
+		sounds: Iterable[str] = (),
+		levels: Iterable[str] = (),
+	) -> None:
+		"""starts decoding in the background, sounds need `pygame.mixer` to be initialized"""
+
+		for path in images:
+			self._submit(self._images, path, _decode_image)
+		for path in sounds:
+			self._submit(self._sounds, path, _decode_sound)
+		for path in levels:
+			self._submit(self._levels, path, load_level)
+
+	def _get(self, cache: dict, path: str, decode):
+		entry = cache.get(path)
+		if entry is None:
+			entry = cache[path] = decode(path)
+		elif isinstance(entry, Future):
+			entry = cache[path] = entry.result()
+		return entry
+
+	def get_image(self, path: str) -> pygame.Surface | None:
+		converted = self._converted.get(path)
+		if converted is not None:
+			return converted
+
+		image = self._get(self._images, path, _decode_image)
+		if image is None or pygame.display.get_surface() is None:
+			return image
+
+		converted = self._converted[path] = image.convert_alpha()
+		return converted
+
+	def get_sound(self, path: str) -> pygame.mixer.Sound | None:
+		return self._get(self._sounds, path, _decode_sound)
+
+	def get_level(self, path: str) -> Level:
+		return self._get(self._levels, path, load_level)
+
+	def get_scaled(self, surface: pygame.Surface, size: tuple[int | float, int | float]) -> pygame.Surface:
+		"""returns a shared scaled copy of `surface`, which must not be drawn on"""
+
+		size = (int(size[0]), int(size[1]))
+		key = (id(surface), size)
+		cached = self._scaled.get(key)
+		if cached is not None and cached[0] is surface:
+			return cached[1]
+
+		scaled = pygame.transform.scale(surface, size)
+		self._scaled[key] = (surface, scaled)
+		return scaled
+
+	def shutdown(self) -> None:
+		if self._executor is not None:
+			self._executor.shutdown(wait=False, cancel_futures=True)
+			self._executor = None
+
+
+assets = AssetManager()
@@ -0,0 +1,222 @@
+"""headless benchmark of the game loop.
+
+Usage: python -m src.bench [--frames N] [--size WxH] [--seed S] [--restarts N] [--json PATH]
+
+Builds the level from `main.create_game` under the SDL dummy video driver
+with a standalone moderngl context, drives `update`/`render` with scripted
+input and reports per-phase frame timings. With `--restarts` it also times
+an in-place `Game.reset` and building a game and rendering its first frame,
+once with the display session kept open (a restart) and once with it closed
+in between (a cold start)
+"""
+
+import argparse
+import json
+import os
+import random
+import time
+from collections import defaultdict
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np  # noqa: E402
+import pygame  # noqa: E402
+
+from .shaders import display_session  # noqa: E402
+
+
+PHASES = (
+	'physics',
+	'player',
+	'particles',
+	'cpu_render',
+	'shader',
+	'readback',
+	'frame',
+)
+
+RESTART_PHASES = ('reset', 'restart', 'cold_start')
+
+ACTION_KEYS = {
+	'left': pygame.K_LEFT,
+	'right': pygame.K_RIGHT,
+	'jump_left': pygame.K_SPACE,
+	'jump_right': pygame.K_UP,
+	'restart': pygame.K_r,
+}
+
+
+def default_script(frames: int, period: int = 240) -> list[tuple[int, str, bool]]:
+	"""walk right with double jumps, then restart if the round has ended"""
+
+	script = []
+	for start in range(0, frames, period):
+		script += [
+			(start + 40, 'right', True),
+			(start + 80, 'jump_left', True),
+			(start + 80, 'jump_right', True),
+			(start + 81, 'jump_left', False),
+			(start + 81, 'jump_right', False),
+			(start + 95, 'jump_left', True),
+			(start + 95, 'jump_right', True),
+			(start + 96, 'jump_left', False),
+			(start + 96, 'jump_right', False),
+			(start + 200, 'right', False),
+			(start + 230, 'restart', True),
+			(start + 231, 'restart', False),
+		]
+	return [event for event in script if event[0] < frames]
+
+
+PROFILER_PHASES = {
+	'physics': ('physics',),
+	'player': ('player',),
+	'particles': ('particles',),
+	'cpu_render': ('scene',),
+	'shader': ('upload', 'sprite_batch', 'ps1_pass', 'overlays', 'present'),
+}
+
+
+def summarize(samples: dict[str, list[float]], phases: tuple[str, ...] = PHASES) -> dict[str, dict[str, float]]:
+	report = {}
+	for phase in phases:
+		values = np.array(samples[phase]) * 1000.0
+		if not len(values):
+			continue
+		report[phase] = {
+			'mean': float(values.mean()),
+			'p50': float(np.percentile(values, 50)),
+			'p95': float(np.percentile(values, 95)),
+			'p99': float(np.percentile(values, 99)),
+		}
+	return report
+
+
+def build_game(size: tuple[int, int], seed: int):
+	from main import create_game
+
+	random.seed(seed)
+	game = create_game(None, size=size)
+	game.reseed(seed)
+	return game
+
+
+def send_action(game, action: str, state: bool) -> None:
+	event_type = pygame.KEYDOWN if state else pygame.KEYUP
+	game._handle_key(pygame.event.Event(event_type, key=ACTION_KEYS[action], unicode=''), state)
+
+
+def run(frames: int, size: tuple[int, int], seed: int, warmup: int, readback: bool) -> dict:
+	game = build_game(size, seed)
+	game.profiler.enabled = True
+	effect = getattr(game, '_shader_effect', None)
+	samples = defaultdict(list)
+
+	script = defaultdict(list)
+	for frame, action, state in default_script(warmup + frames):
+		script[frame].append((action, state))
+
+	frame_time = game._fixed_dt
+
+	for frame in range(warmup + frames):
+		for action, state in script.get(frame, ()):
+			send_action(game, action, state)
+
+		frame_start = time.perf_counter()
+		game.update(frame_time)
+		game.render()
+
+		readback_time = 0.0
+		if effect is not None and readback:
+			readback_start = time.perf_counter()
+			effect.ctx.finish()
+			effect.output_fbo.read(components=4)
+			readback_time = time.perf_counter() - readback_start
+
+		frame_total = time.perf_counter() - frame_start
+
+		if frame < warmup:
+			continue
+
+		phases = game.profiler.last_frame()
+		for phase, names in PROFILER_PHASES.items():
+			samples[phase].append(sum(phases.get(name, 0.0) for name in names))
+		samples['readback'].append(readback_time)
+		samples['frame'].append(frame_total)
+
+	return summarize(samples)
+
+
+def render_first_frame(game) -> None:
+	game.update(game._fixed_dt)
+	game.render()
+	effect = getattr(game, '_shader_effect', None)
+	if effect is not None:
+		effect.ctx.finish()
+
+
+def measure_restarts(count: int, size: tuple[int, int], seed: int) -> dict:
+	samples = defaultdict(list)
+
+	game = build_game(size, seed)
+	for _ in range(count):
+		game.update(game._fixed_dt)
+		start = time.perf_counter()
+		game.reset()
+		render_first_frame(game)
+		samples['reset'].append(time.perf_counter() - start)
+
+	for name in ('restart', 'cold_start'):
+		for _ in range(count):
+			if name == 'cold_start':
+				display_session.close()
+
+			start = time.perf_counter()
+			render_first_frame(build_game(size, seed))
+			samples[name].append(time.perf_counter() - start)
+
+	return summarize(samples, RESTART_PHASES)
+
+
+def print_report(report: dict, frames: int, size: tuple[int, int]) -> None:
+	print(f'{frames} frames at {size[0]}x{size[1]}')
+	print(f'{"phase":<12}{"mean":>10}{"p50":>10}{"p95":>10}{"p99":>10}  (ms)')
+	for phase, stats in report.items():
+		print(
+			f'{phase:<12}{stats["mean"]:>10.3f}{stats["p50"]:>10.3f}'
+			f'{stats["p95"]:>10.3f}{stats["p99"]:>10.3f}'
+		)
+
+
+def parse_size(value: str) -> tuple[int, int]:
+	width, height = value.lower().split('x')
+	return (int(width), int(height))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Headless game loop benchmark')
+	parser.add_argument('--frames', type=int, default=600)
+	parser.add_argument('--warmup', type=int, default=60)
+	parser.add_argument('--size', type=parse_size, default=(1920, 1080))
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--no-readback', action='store_true', help='do not wait for and read the final frame')
+	parser.add_argument('--restarts', type=int, default=0, help='also time N restarts and N cold starts')
+	parser.add_argument('--json', help='write the report to this path')
+	args = parser.parse_args()
+
+	report = run(args.frames, args.size, args.seed, args.warmup, not args.no_readback)
+	if args.restarts:
+		report.update(measure_restarts(args.restarts, args.size, args.seed))
+	print_report(report, args.frames, args.size)
+
+	if args.json:
+		with open(args.json, 'w') as file:
+			json.dump(report, file, indent='\t')
+
+	display_session.close()
+	pygame.quit()
+
+
+if __name__ == '__main__':
+	main()
@@ -1,3 +1,6 @@
+import pygame
+
+
 class Camera:
 	def __init__(self, screen_width: int, screen_height: int) -> None:
 		self.screen_width = screen_width
@@ -12,6 +15,16 @@ class Camera:
 	def apply(self, rect) -> None:
 		return rect.move(-self.x, -self.y)
 
+	def get_view_rect(self, margin: int = 0) -> pygame.Rect:
+		"""returns the visible area in world pixels, grown by `margin` on each side"""
+
+		return pygame.Rect(
+			self.x - margin,
+			self.y - margin,
+			self.screen_width + margin * 2,
+			self.screen_height + margin * 2
+		)
+
 	def get_offset(self) -> tuple[int, int]:
 		return (self.x, self.y)
 
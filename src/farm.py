@@ -0,0 +1,409 @@
+"""parallel headless validation of a level.
+
+Usage: python -m src.farm LEVEL [--runs N] [--workers N] [--seconds S] [--seed S]
+                              [--replay PATH ...] [--size WxH] [--json PATH]
+
+Plays many runs of a level on a process pool, each in a simulation-only
+`Game` that needs no display. A run replays a recorded `InputLog` or is
+flown by a `Pilot` seeded per run, and ends at the finish, when the bag
+tears or at the time limit. Runs share nothing, so throughput grows with
+the worker count; the report aggregates the completion rate, the time to
+the finish and why bags tore
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pygame
+
+from .player import TEAR_CAUSES
+from .replay import InputLog, build_replay_game, simulation_digest
+
+
+# physics rate of scripted runs, replays keep the rate they were recorded at
+SCRIPTED_PHYSICS_HZ = 60
+
+# what the pilot expects one double jump to clear, in level pixels
+MAX_RISE = 160
+MAX_GAP = 280
+# longer falls land hard enough to tear the bag
+MAX_DROP = 400
+# room the pair needs to slip in under a platform hanging over its target
+MIN_CLEARANCE = 120
+
+
+def platform_rects(level) -> np.ndarray:
+	"""left, top, right, bottom of every platform of `level`, the finish last"""
+
+	platforms = level.platforms
+	rects = np.empty((len(platforms) + 1, 4))
+	rects[:-1, 0] = platforms['x'] - platforms['width'] / 2
+	rects[:-1, 1] = platforms['y'] - platforms['height'] / 2
+	rects[:-1, 2] = platforms['x'] + platforms['width'] / 2
+	rects[:-1, 3] = platforms['y'] + platforms['height'] / 2
+	(finish_x, finish_y), (finish_width, finish_height) = level.finish_position, level.finish_size
+	rects[-1] = (
+		finish_x - finish_width / 2,
+		finish_y - finish_height / 2,
+		finish_x + finish_width / 2,
+		finish_y + finish_height / 2,
+	)
+	return rects
+
+
+def plan_route(rects: np.ndarray, start: int, goal: int) -> list[int] | None:
+	"""shortest chain of platforms from `start` to `goal` that double jumps can take"""
+
+	lefts, tops, rights, bottoms = rects.T
+	centers = (lefts + rights) / 2
+	distances = {start: 0.0}
+	previous = {}
+	queue = [(0.0, start)]
+	while queue:
+		distance, index = heapq.heappop(queue)
+		if index == goal:
+			route = [goal]
+			while route[-1] != start:
+				route.append(previous[route[-1]])
+			return route[::-1]
+		if distance > distances[index]:
+			continue
+
+		gaps = np.maximum(np.maximum(lefts - rights[index], lefts[index] - rights), 0)
+		reachable = (gaps <= MAX_GAP) & (tops[index] - tops <= MAX_RISE) & (tops - tops[index] <= MAX_DROP)
+		reachable[index] = False
+		for other in np.flatnonzero(reachable).tolist():
+			# a platform hanging low over the target leaves no way in
+			over = (lefts < rights[other]) & (rights > lefts[other]) & (tops < tops[other])
+			over[other] = False
+			if (tops[other] - bottoms[over] < MIN_CLEARANCE).any():
+				continue
+			# a hop costs more than its length, so fewer and safer hops win
+			candidate = distance + abs(centers[other] - centers[index]) + abs(tops[other] - tops[index]) + 100
+			if candidate < distances.get(other, np.inf):
+				distances[other] = candidate
+				previous[other] = index
+				heapq.heappush(queue, (candidate, other))
+	return None
+
+
+class Pilot:
+	"""flies the pair from platform to platform along the shortest route to the finish.
+
+	Both parts always jump together: the pilot walks to a take-off point near
+	the edge facing the next platform, jumps without stopping, jumps again at
+	the apex when the target is higher or too far to reach by falling, and
+	steers the pair over the target centre, holding still while moving on
+	would run into another platform. `speed` and `gravity` are in level pixels
+	per second and per second squared. The seed jitters reaction times, the
+	take-off point, the landing spot and the double jump timing, so runs differ
+	"""
+
+	def __init__(self, level, rng: random.Random, speed: float, gravity: float) -> None:
+		self._rects = platform_rects(level)
+		self._goal = len(self._rects) - 1
+		self._rng = rng
+		self._speed = speed
+		self._gravity = gravity
+		self._platform = None
+		self._route = None
+		self._airborne = False
+		self._air_steps = 0
+		self._ground_steps = 0
+		self._double_jumped = False
+		self._reaction_steps = 3
+		self._takeoff_margin = 0.0
+		self._landing_offset = 0.0
+		self._apex_velocity = 0.0
+
+	def _platform_under(self, x: float, bottom: float) -> int | None:
+		lefts, tops, rights, _ = self._rects.T
+		under = np.flatnonzero((lefts <= x) & (x <= rights) & (np.abs(tops - bottom) < 8))
+		return int(under[0]) if len(under) else None
+
+	def _is_blocked(self, left: float, top: float, right: float, bottom: float) -> bool:
+		lefts, tops, rights, bottoms = self._rects.T
+		return bool(np.any((lefts < right) & (rights > left) & (tops < bottom) & (bottoms > top)))
+
+	def _plan(self, platform: int) -> None:
+		self._platform = platform
+		self._route = plan_route(self._rects, platform, self._goal)
+		self._reaction_steps = self._rng.randint(3, 6)
+		self._takeoff_margin = self._rng.uniform(2, 14)
+		self._landing_offset = self._rng.uniform(-8, 8)
+		self._apex_velocity = self._rng.uniform(-2, 3)
+
+	def _fall_reach(self, bottom: float, target_top: float) -> float:
+		"""how far the pair drifts sideways falling from rest down to `target_top`"""
+
+		return self._speed * math.sqrt(2 * max(target_top - bottom, 0) / self._gravity)
+
+	def decide(self, player, dt: float) -> tuple[int, bool]:
+		"""returns the direction to hold, -1, 0 or 1, and whether to jump this step"""
+
+		(left_x, left_y), (right_x, right_y) = player.get_parts_screen_positions()
+		part_width, part_height = player.get_part_size()
+		center = (left_x + right_x) / 2
+		half_width = (right_x - left_x) / 2 + part_width / 2
+		top = min(left_y, right_y) - part_height / 2
+		bottom = max(left_y, right_y) + part_height / 2
+		on_ground = all(player.is_on_ground())
+		self._ground_steps = self._ground_steps + 1 if on_ground else 0
+
+		if self._airborne:
+			self._air_steps += 1
+			# ground contact lags the jump by a couple of steps and flickers on landing,
+			# jumping off a flicker costs the jump the player spends on walking off a ledge
+			if self._ground_steps >= self._reaction_steps and self._air_steps > 5:
+				self._airborne = False
+		if not self._airborne:
+			if self._ground_steps < self._reaction_steps:
+				return (0, False)
+			platform = self._platform_under(center, bottom)
+			if platform is not None and platform != self._platform:
+				self._plan(platform)
+
+		if self._route is None or len(self._route) < 2:
+			return (0, False)
+
+		current_left, _, current_right, _ = self._rects[self._platform]
+		target_left, target_top, target_right, _ = self._rects[self._route[1]]
+		target_x = (target_left + target_right) / 2
+		direction = 1 if target_x > center else -1
+
+		if self._airborne:
+			jump = False
+			velocity_y = player.get_parts_velocities()[0][1]
+			if not self._double_jumped and self._air_steps > 3 and velocity_y <= self._apex_velocity:
+				self._double_jumped = True
+				remaining = abs(target_x - center) - part_width
+				jump = bottom > target_top - 10 or remaining > self._fall_reach(bottom, target_top)
+
+			offset = target_x + self._landing_offset - center
+			steer = 0 if abs(offset) < 3 else (1 if offset > 0 else -1)
+			shift = steer * self._speed * dt
+			# the bag hangs below the parts, keep a little room for it
+			left, right = center - half_width + shift, center + half_width + shift
+			if steer and self._is_blocked(left, top - 4, right, bottom + 12):
+				steer = 0
+			return (steer, jump)
+
+		half_span = (right_x - left_x) / 2
+		if direction > 0 and target_left > current_right:
+			takeoff = current_right - half_span - self._takeoff_margin
+		elif direction < 0 and target_right < current_left:
+			takeoff = current_left + half_span + self._takeoff_margin
+		else:
+			takeoff = min(max(target_x, current_left + half_span), current_right - half_span)
+
+		offset = takeoff - center
+		if abs(offset) < 4:
+			self._airborne = True
+			self._air_steps = 0
+			self._double_jumped = False
+			return (direction, True)
+		return (1 if offset > 0 else -1, False)
+
+
+def _init_worker() -> None:
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+
+DIRECTION_KEYS = {-1: pygame.K_LEFT, 1: pygame.K_RIGHT}
+
+
+def _send_key(game, log: InputLog, step: int, key: int, state: bool) -> None:
+	log.add(step, key, '', state)
+	event_type = pygame.KEYDOWN if state else pygame.KEYUP
+	game._handle_key(pygame.event.Event(event_type, key=key, unicode=''), state)
+
+
+def fly(game, pilot: Pilot, log: InputLog, max_steps: int) -> int:
+	"""lets `pilot` play, logging its key events so the run can be replayed, returns the steps taken"""
+
+	held = 0
+	jumping = False
+	steps = 0
+	while steps < max_steps and not game._is_victory and not game._is_game_over:
+		if jumping:
+			_send_key(game, log, steps, pygame.K_SPACE, False)
+			_send_key(game, log, steps, pygame.K_UP, False)
+			jumping = False
+
+		direction, jump = pilot.decide(game._player, game._fixed_dt)
+		if direction != held:
+			if held:
+				_send_key(game, log, steps, DIRECTION_KEYS[held], False)
+			if direction:
+				_send_key(game, log, steps, DIRECTION_KEYS[direction], True)
+			held = direction
+		if jump:
+			# both parts together, released before the next step like a tap
+			_send_key(game, log, steps, pygame.K_SPACE, True)
+			_send_key(game, log, steps, pygame.K_UP, True)
+			jumping = True
+
+		game.step()
+		steps += 1
+	return steps
+
+
+def simulate(task: tuple[str, tuple[int, int], int, dict | None, int]) -> dict:
+	"""plays one run until the finish, a torn bag or `max_steps`, runs in a worker process.
+
+	Without recorded input the run is flown by a `Pilot` seeded with the task seed,
+	and a run that doesn't finish returns the input it logged, so it can be replayed
+	"""
+
+	level_path, size, seed, log_data, max_steps = task
+	if log_data is None:
+		log = InputLog(seed=seed, level_path=level_path, size=size, physics_hz=SCRIPTED_PHYSICS_HZ, streaming=True)
+	else:
+		log = InputLog.from_dict(log_data)
+		log.level_path = level_path
+
+	start = time.perf_counter()
+	game = build_replay_game(log)
+
+	if log_data is None:
+		ppm = game.physics_world.ppm
+		pilot = Pilot(
+			game._level,
+			random.Random(seed),
+			speed=game._player.get_speed() * ppm,
+			gravity=-game.physics_world.world.gravity.y * ppm,
+		)
+		steps = fly(game, pilot, log, max_steps)
+	else:
+		events = log.events_by_step()
+		steps = 0
+		while steps < max_steps and not game._is_victory and not game._is_game_over:
+			for key, unicode, state in events.get(steps, ()):
+				event_type = pygame.KEYDOWN if state else pygame.KEYUP
+				game._handle_key(pygame.event.Event(event_type, key=key, unicode=unicode), state)
+			game.step()
+			steps += 1
+
+	result = {
+		'seed': log.seed,
+		'completed': game._is_victory,
+		'finish_time': game._victory_time if game._is_victory else None,
+		'tear_cause': game._player.get_tear_cause(),
+		'steps': steps,
+		'seconds': time.perf_counter() - start,
+	}
+	if log_data is None and not game._is_victory:
+		log.finish(steps, simulation_digest(game))
+		result['log'] = log.to_dict()
+	return result
+
+
+def save_failed_logs(results: list[dict], json_path: str) -> None:
+	"""moves the logs of failed scripted runs out of `results` into replay files next to `json_path`"""
+
+	root, _ = os.path.splitext(json_path)
+	for result in results:
+		log_data = result.pop('log', None)
+		if log_data is not None:
+			path = result['replay'] = f'{root}_seed{result["seed"]}.json'
+			with open(path, 'w', encoding='utf-8') as file:
+				json.dump(log_data, file)
+
+
+def summarize_runs(results: list[dict]) -> dict:
+	runs = len(results)
+	finish_times = np.array([result['finish_time'] for result in results if result['completed']])
+	causes = Counter(result['tear_cause'] for result in results if result['tear_cause'] is not None)
+	timeouts = sum(1 for result in results if not result['completed'] and result['tear_cause'] is None)
+
+	report = {
+		'runs': runs,
+		'completed': len(finish_times),
+		'completion_rate': len(finish_times) / runs if runs else 0.0,
+		'timeouts': timeouts,
+		'tear_causes': {cause: causes.get(cause, 0) for cause in TEAR_CAUSES},
+		'steps': int(sum(result['steps'] for result in results)),
+	}
+	if len(finish_times):
+		report['finish_time'] = {
+			'min': float(finish_times.min()),
+			'mean': float(finish_times.mean()),
+			'p50': float(np.percentile(finish_times, 50)),
+			'p90': float(np.percentile(finish_times, 90)),
+		}
+	return report
+
+
+def run_farm(tasks: list[tuple], workers: int | None = None) -> list[dict]:
+	workers = workers or os.cpu_count() or 1
+	# a few chunks per worker keeps every core busy without paying a round trip per run
+	chunksize = max(1, len(tasks) // (workers * 4))
+	with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+		return list(executor.map(simulate, tasks, chunksize=chunksize))
+
+
+def print_report(report: dict, wall_time: float) -> None:
+	steps = report['steps']
+	print(f'{report["runs"]} runs, {steps} steps in {wall_time:.1f} s ({steps / wall_time:.0f} steps/s)')
+	print(f'completed  {report["completed"]} ({report["completion_rate"] * 100:.1f}%), timed out {report["timeouts"]}')
+	if 'finish_time' in report:
+		times = report['finish_time']
+		print(
+			f'finish     min {times["min"]:.2f} s, mean {times["mean"]:.2f} s, '
+			f'p50 {times["p50"]:.2f} s, p90 {times["p90"]:.2f} s'
+		)
+	for cause, count in report['tear_causes'].items():
+		print(f'{cause:<11}{count}')
+
+
+def parse_size(value: str) -> tuple[int, int]:
+	width, height = value.lower().split('x')
+	return (int(width), int(height))
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Parallel headless level validation')
+	parser.add_argument('level')
+	parser.add_argument('--runs', type=int, default=100, help='scripted runs, ignored with --replay')
+	parser.add_argument('--workers', type=int, default=None, help='defaults to the number of cores')
+	parser.add_argument('--seconds', type=float, default=60.0, help='time limit of a run')
+	parser.add_argument('--seed', type=int, default=0, help='seed of the first scripted run')
+	parser.add_argument('--replay', nargs='+', help='play these recorded runs instead of scripted input')
+	parser.add_argument('--size', type=parse_size, default=(1280, 720))
+	parser.add_argument('--json', help='write the report to this path, and failed scripted runs next to it')
+	args = parser.parse_args()
+
+	if args.replay:
+		logs = [InputLog.load(path) for path in args.replay]
+		tasks = [
+			(args.level, log.size, log.seed, log.to_dict(), round(args.seconds * log.physics_hz))
+			for log in logs
+		]
+	else:
+		max_steps = round(args.seconds * SCRIPTED_PHYSICS_HZ)
+		tasks = [(args.level, args.size, seed, None, max_steps) for seed in range(args.seed, args.seed + args.runs)]
+
+	start = time.perf_counter()
+	results = run_farm(tasks, args.workers)
+	wall_time = time.perf_counter() - start
+
+	report = summarize_runs(results)
+	print_report(report, wall_time)
+
+	if args.json:
+		save_failed_logs(results, args.json)
+		with open(args.json, 'w') as file:
+			json.dump({'report': report, 'runs': results}, file, indent='\t')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,71 @@
+import os
+from collections import OrderedDict
+
+import pygame
+
+
+DEFAULT_FONT_PATH = os.path.join(
+	os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+	'assets', 'fonts', 'overpass', 'static', 'Overpass-Regular.ttf'
+)
+
+
+class TextCache:
+	"""fonts loaded once per (name, size) and rendered text memoized with LRU eviction"""
+
+	def __init__(self, max_surfaces: int = 256, default_font: str | None = DEFAULT_FONT_PATH) -> None:
+		self._fonts = {}
+		self._surfaces = OrderedDict()
+		self._max_surfaces = max_surfaces
+		self._default_font = default_font
+
+	def _load_font(self, name: str | None, size: int) -> pygame.font.Font:
+		if not pygame.font.get_init():
+			pygame.font.init()
+
+		path = name if name is not None else self._default_font
+		if path is not None and os.path.isfile(path):
+			return pygame.font.Font(path, size)
+
+		return pygame.font.SysFont(name or '', size)
+
+	def get_font(self, size: int, name: str | None = None) -> pygame.font.Font:
+		key = (name, size)
+		font = self._fonts.get(key)
+		if font is None:
+			font = self._load_font(name, size)
+			self._fonts[key] = font
+		return font
+
+	def render(
+		self,
+		text: str,
+		size: int,
+		color,
+		name: str | None = None,
+		antialias: bool = True,
+		background=None,
+	) -> pygame.Surface:
+		if isinstance(color, pygame.Color):
+			color = tuple(color)
+		if isinstance(background, pygame.Color):
+			background = tuple(background)
+
+		key = (text, color, name, size, antialias, background)
+		surface = self._surfaces.get(key)
+		if surface is not None:
+			self._surfaces.move_to_end(key)
+			return surface
+
+		surface = self.get_font(size, name).render(text, antialias, color, background)
+		self._surfaces[key] = surface
+		if len(self._surfaces) > self._max_surfaces:
+			self._surfaces.popitem(last=False)
+		return surface
+
+	def clear(self) -> None:
+		self._surfaces.clear()
+		self._fonts.clear()
+
+
+text_cache = TextCache()
@@ -1,21 +1,63 @@
+import random
 import sys
+import time
 
+import numpy as np
 import pygame
 
 from .bag_debris import create_bag_debris
 from .camera import Camera
 from .confetti import create_confetti
-from .models import ObjectOrderedSet
+from .fonts import text_cache
+from .level import Level, build_level, create_finish_platform
+from .level_streamer import LevelStreamer
+from .particle_system import ParticleSystem
 from .platform import FinishPlatform
 from .physic import PhysicsWorld
-from .snow import create_snow
+from .profiler import FrameProfiler
+from .replay import META_KEYS, InputLog, simulation_digest
+from .rewind import RewindBuffer
+from .snow import SnowField
+from .static_layer import StaticLayer
+
+
+# platforms this far outside the screen are still drawn, so nothing pops in at the edges
+CULL_MARGIN = 64
+
+# round state restored by `Game.restore` along with bodies, player and particles
+ROUND_STATE_DTYPE = np.dtype([
+	('is_game_over', '?'),
+	('is_victory', '?'),
+	('victory_time', '<f8'),
+	('victory_sound_played', '?'),
+	('debris_spawned', '?'),
+	('confetti_spawned', '?'),
+	('sim_time', '<f8'),
+	# NaN while there is none
+	('last_bag_screen_position', '<f8', 2),
+	('finish_triggered', '?'),
+	('camera', '<i8', 2),
+])
+
+# scalar fields of `ROUND_STATE_DTYPE` that map to `Game._<name>`
+ROUND_STATE_FIELDS = (
+	'is_game_over',
+	'is_victory',
+	'victory_time',
+	'victory_sound_played',
+	'debris_spawned',
+	'confetti_spawned',
+	'sim_time',
+)
 
 
 def render_fps_counter(master, clock, pos=(4, 4)) -> None:
-	fps = round(clock.get_fps())
-	font = pygame.font.SysFont('', 20)
-	surface = font.render(f'FPS: {fps}', True, '#f2f2f2', None)
-	master.blit(surface, pos)
+	master.blit(fps_counter_surface(clock), pos)
+
+
+def fps_counter_surface(clock) -> pygame.Surface:
+	# memoized by text, so a new surface is only rendered when the integer FPS changes
+	return text_cache.render(f'FPS: {round(clock.get_fps())}', 20, '#f2f2f2')
 
 
 class Game:
@@ -36,6 +78,13 @@ class Game:
 		death_zone_y: int = -1000,
 		enable_snow: bool = False,
 		snow_density: int = 100,
+		physics_hz: int = 60,
+		max_physics_steps: int = 5,
+		profile: bool = False,
+		profile_path: str = 'profile',
+		rewind_seconds: float = 0.0,
+		replay_path: str = 'replay.json',
+		simulation_only: bool = False,
 	) -> None:
 		self.size = size
 		self._bg = bg
@@ -48,9 +97,27 @@ class Game:
 		self._sound_manager = sound_manager
 		self._enable_snow = enable_snow
 		self._snow_density = snow_density
-
-		self._screen = pygame.display.set_mode(self.size, pygame.RESIZABLE)
-		pygame.display.set_caption(title)
+		self._fixed_dt = 1.0 / physics_hz
+		self._max_physics_steps = max_physics_steps
+		self._accumulator = 0.0
+		self._last_update_time = None
+		self._physics_alpha = 1.0
+		self._sim_time = 0.0
+		self.profiler = FrameProfiler(enabled=profile)
+		self._profile_path = profile_path
+		self._show_profiler = False
+		self._replay_path = replay_path
+		self._input_log = None
+		self._step_index = 0
+		self._level = None
+		self._streaming = False
+		# steps the world without a window, sprites or snow, `render` does nothing
+		self.simulation_only = simulation_only
+
+		if simulation_only:
+			self._screen = None
+		else:
+			self._init_display(title)
 		self._clock = pygame.time.Clock()
 		self._is_game_loop = False
 		self._is_game_over = False
@@ -59,12 +126,13 @@ class Game:
 		self.physics_world = PhysicsWorld(
 			gravity=gravity,
 			ppm=physics_ppm,
-			screen_height=size[1]
+			screen_height=size[1],
+			simulation_only=simulation_only,
 		)
 
-		self._debris_particles = None
+		self._debris_particles = ParticleSystem()
 		self._debris_spawned = False
-		self._confetti_particles = None
+		self._confetti_particles = ParticleSystem()
 		self._confetti_spawned = False
 		self._victory_sound_played = False
 		self._victory_time = 0
@@ -72,23 +140,128 @@ class Game:
 		self._death_zone_world_y = death_zone_y
 		self._finish_platform = None
 		self._snow_particles = None
+		self._level_streamer = None
+		self._initial_state = None
 
 		if self._use_camera:
 			self._camera = Camera(self.size[0], self.size[1])
+			self._static_layer = None if simulation_only else StaticLayer(platform_group)
 		else:
 			self._camera = None
+			self._static_layer = None
 
-		if self._enable_snow:
+		if self._enable_snow and not self.simulation_only:
 			self._spawn_snow()
 
-	def _spawn_snow(self):
-		from .snow import create_snow
+		# F5 steps back through this many seconds of simulation, 0 disables recording
+		self._rewind_buffer = RewindBuffer(self, rewind_seconds) if rewind_seconds > 0 else None
+
+	def _init_display(self, title: str) -> None:
+		self._screen = pygame.display.set_mode(self.size, pygame.RESIZABLE)
+		pygame.display.set_caption(title)
+
+	def _spawn_snow(self, seed: int | None = None):
 		cam_offset = self._camera.get_offset() if self._camera else (0, 0)
-		self._snow_particles = create_snow(self._snow_density, self.size[0], self.size[1], cam_offset)
+		self._snow_particles = SnowField(self._snow_density, self.size[0], self.size[1], cam_offset, seed)
+
+	def toggle_profiler_overlay(self) -> None:
+		self._show_profiler = not self._show_profiler
+		if self._show_profiler:
+			self.profiler.enabled = True
+
+	def dump_profile(self) -> None:
+		self.profiler.dump_csv(f'{self._profile_path}.csv')
+		self.profiler.dump_chrome_trace(f'{self._profile_path}_trace.json')
+
+	def reseed(self, seed: int) -> None:
+		random.seed(seed)
+		self._debris_particles.reseed(seed)
+		self._confetti_particles.reseed(seed + 1)
+		if self._snow_particles is not None:
+			self._spawn_snow(seed + 2)
+		if self._player is not None:
+			self._player.reseed(seed + 3)
+
+	def start_recording(self, seed: int | None = None) -> None:
+		"""restarts the level and logs every key event by simulation step, see `InputLog`"""
+
+		if seed is None:
+			seed = random.randrange(2 ** 31)
+
+		self.reset()
+		self.reseed(seed)
+		self._input_log = InputLog(
+			seed=seed,
+			level_path=self._level.path if self._level is not None else None,
+			size=self.size,
+			physics_hz=round(1.0 / self._fixed_dt),
+			streaming=self._streaming,
+			start_step=self._step_index,
+		)
+
+	def stop_recording(self) -> InputLog | None:
+		log = self._input_log
+		if log is not None:
+			log.finish(self._step_index, simulation_digest(self))
+			self._input_log = None
+		return log
+
+	def toggle_recording(self) -> None:
+		if self._input_log is None:
+			self.start_recording()
+		else:
+			self.stop_recording().save(self._replay_path)
 
 	def set_finish_platform(self, finish_platform: FinishPlatform) -> None:
 		self._finish_platform = finish_platform
 
+	def load_level(self, level: Level, streaming: bool = False) -> None:
+		"""replaces the platforms, finish and world settings with those of `level`.
+
+		Can be called on a running game, the player is then moved to the new spawn.
+		With `streaming` only the platforms around the player are kept in Box2D,
+		see `LevelStreamer`
+		"""
+
+		self._level_streamer = None
+		self._initial_state = None
+		self._level = level
+		self._streaming = streaming
+		if self._rewind_buffer is not None:
+			self._rewind_buffer.clear()
+		self.physics_world.destroy_bodies(self._platform_group.sprites())
+		self._platform_group.empty()
+		if self._static_layer is not None:
+			self._static_layer.clear()
+
+		self.physics_world.set_gravity(level.gravity)
+		self._death_zone_world_y = level.death_zone_y
+
+		if streaming:
+			finish_platform = create_finish_platform(self.physics_world, level)
+			self._platform_group.add(finish_platform)
+			self.set_finish_platform(finish_platform)
+			self._level_streamer = LevelStreamer(
+				self.physics_world,
+				level,
+				self._platform_group,
+				static_layer=self._static_layer
+			)
+			if self._player is None:
+				self._level_streamer.update([self.physics_world.screen_to_world(level.spawn)], force=True)
+		else:
+			self.set_finish_platform(build_level(self.physics_world, level, self._platform_group))
+
+		self._enable_snow = level.enable_snow
+		self._snow_density = level.snow_density
+		self._snow_particles = None
+		if self._enable_snow and not self.simulation_only:
+			self._spawn_snow()
+
+		if self._player is not None:
+			self._player.set_spawn(level.spawn)
+			self._reset_round()
+
 	def _check_player_death(self) -> bool:
 		left_world_y = self._player._left_part.body.position.y
 		right_world_y = self._player._right_part.body.position.y
@@ -110,6 +283,11 @@ class Game:
 			if hasattr(sprite, '_update_sprite_position'):
 				sprite._update_sprite_position()
 
+		if hasattr(self._platform_group, 'rebuild'):
+			self._platform_group.rebuild()
+		if self._static_layer is not None:
+			self._static_layer.clear()
+
 	def handle_events(self) -> None:
 		for event in pygame.event.get():
 			match event.type:
@@ -122,7 +300,24 @@ class Game:
 				case pygame.VIDEORESIZE:
 					self._handle_resize(event.w, event.h)
 
+	def _sync_held_keys(self) -> None:
+		# a rewind restores the keys held back then, the player should follow the ones held now,
+		# a simulation-only game has no keyboard to ask so nothing is held
+		if self.simulation_only:
+			left = right = False
+		else:
+			pressed = pygame.key.get_pressed()
+			left = pressed[pygame.K_LEFT] or pressed[pygame.K_a]
+			right = pressed[pygame.K_RIGHT] or pressed[pygame.K_d]
+		self._player.move_key('left', left)
+		self._player.move_key('right', right)
+		self._player.move_key('jump_left', False)
+		self._player.move_key('jump_right', False)
+
 	def _handle_key(self, event: pygame.event.Event, state: bool) -> None:
+		if self._input_log is not None and event.key not in META_KEYS:
+			self._input_log.add(self._step_index, event.key, getattr(event, 'unicode', ''), state)
+
 		match event.key:
 			case pygame.K_ESCAPE:
 				if state:
@@ -135,18 +330,21 @@ class Game:
 				self._player.move_key('jump_left', state)
 			case pygame.K_UP:
 				self._player.move_key('jump_right', state)
+			case pygame.K_F3:
+				if state:
+					self.toggle_profiler_overlay()
+			case pygame.K_F4:
+				if state:
+					self.dump_profile()
+			case pygame.K_F5:
+				if state and self.rewind():
+					self._sync_held_keys()
+			case pygame.K_F6:
+				if state:
+					self.toggle_recording()
 			case pygame.K_r:
 				if state and (self._is_game_over or self._is_victory):
-					self._player.respawn()
-					self._is_game_over = False
-					self._is_victory = False
-					self._debris_particles = None
-					self._debris_spawned = False
-					self._confetti_particles = None
-					self._confetti_spawned = False
-					self._victory_sound_played = False
-					if self._finish_platform:
-						self._finish_platform.reset()
+					self.reset()
 			case _:
 				if hasattr(event, 'unicode'):
 					match event.unicode.lower():
@@ -156,46 +354,182 @@ class Game:
 							self._player.move_key('right', state)
 						case 'к':
 							if state and (self._is_game_over or self._is_victory):
-								self._player.respawn()
-								self._is_game_over = False
-								self._is_victory = False
-								self._debris_particles = None
-								self._debris_spawned = False
-								self._confetti_particles = None
-								self._confetti_spawned = False
-								self._victory_sound_played = False
-								if self._finish_platform:
-									self._finish_platform.reset()
-
-	def update(self) -> None:
-		self.physics_world.step(1.0 / self._fps)
-
-		current_time = pygame.time.get_ticks() / 1000.0
-
-		if self._debris_particles is not None:
-			self._debris_particles.update()
-			if len(self._debris_particles) == 0:
-				self._debris_particles = None
+								self.reset()
+
+	def _reset_round(self) -> None:
+		self._player.respawn()
+		self._is_game_over = False
+		self._is_victory = False
+		self._debris_particles.clear()
+		self._debris_spawned = False
+		self._confetti_particles.clear()
+		self._confetti_spawned = False
+		self._victory_sound_played = False
+		if self._finish_platform:
+			self._finish_platform.reset()
+			self._invalidate_platform(self._finish_platform)
+
+		self._stream_level(force=True)
+
+	def get_round_state(self) -> np.ndarray:
+		"""returns the game's own flags as a `ROUND_STATE_DTYPE` record"""
+
+		state = np.zeros((), dtype=ROUND_STATE_DTYPE)
+		for name in ROUND_STATE_FIELDS:
+			state[name] = getattr(self, '_' + name)
+		if self._last_bag_screen_position is None:
+			state['last_bag_screen_position'] = np.nan
+		else:
+			state['last_bag_screen_position'] = self._last_bag_screen_position
+		state['finish_triggered'] = self._finish_platform is not None and self._finish_platform.has_triggered
+		if self._camera is not None:
+			state['camera'] = self._camera.get_offset()
+		return state
+
+	def _set_round_state(self, state: np.ndarray) -> None:
+		for name in ROUND_STATE_FIELDS:
+			setattr(self, '_' + name, state[name].item())
+
+		last_bag_screen_position = tuple(state['last_bag_screen_position'].tolist())
+		self._last_bag_screen_position = None if np.isnan(last_bag_screen_position[0]) else last_bag_screen_position
+
+		finish_triggered = bool(state['finish_triggered'])
+		if self._finish_platform and self._finish_platform.has_triggered != finish_triggered:
+			self._finish_platform.has_triggered = finish_triggered
+			self._invalidate_platform(self._finish_platform)
+
+		if self._camera is not None:
+			self._camera.x, self._camera.y = state['camera'].tolist()
+
+	def snapshot(self) -> dict:
+		"""captures the round state that `restore` puts back in place.
+
+		Static platforms never change, so only the dynamic bodies, the player,
+		the game flags and the particles are stored
+		"""
+
+		return {
+			'round': self.get_round_state(),
+			'bodies': self.physics_world.snapshot(),
+			'player': self._player.snapshot(),
+			'debris': self._debris_particles.snapshot(),
+			'confetti': self._confetti_particles.snapshot(),
+			'snow': self._snow_particles.snapshot() if self._snow_particles is not None else None,
+		}
+
+	def restore(self, snapshot: dict) -> None:
+		"""moves the existing world back to `snapshot`, no bodies or fixtures are created.
 
-		if self._confetti_particles is not None:
+		Particle and snow entries may be None to leave those systems as they are
+		"""
+
+		self._set_round_state(snapshot['round'])
+		self._player.restore(snapshot['player'])
+		self.physics_world.restore(snapshot['bodies'])
+
+		if snapshot['debris'] is not None:
+			self._debris_particles.restore(snapshot['debris'])
+		if snapshot['confetti'] is not None:
+			self._confetti_particles.restore(snapshot['confetti'])
+		if self._snow_particles is not None and snapshot['snow'] is not None:
+			self._snow_particles.restore(snapshot['snow'])
+
+		self.reset_timestep()
+		self._stream_level(force=True)
+
+	def rewind(self, seconds: float = 1.0) -> float:
+		"""steps back through the recorded history, returns the seconds actually rewound.
+
+		Does nothing while an `InputLog` is recorded, the log can't go back in time
+		"""
+
+		if self._rewind_buffer is None or self._input_log is not None:
+			return 0.0
+		return self._rewind_buffer.rewind(round(seconds / self._fixed_dt)) * self._fixed_dt
+
+	def reset(self) -> None:
+		"""restarts the level in place from the state captured before its first step"""
+
+		if self._initial_state is None:
+			self._reset_round()
+		else:
+			self.restore(self._initial_state)
+
+	def _stream_level(self, force: bool = False) -> None:
+		if self._level_streamer is None or self._player is None:
+			return
+
+		with self.profiler.scope('streaming'):
+			self._level_streamer.update(
+				[
+					(part.body.position.x, part.body.position.y)
+					for part in (self._player._left_part, self._player._bag, self._player._right_part)
+				],
+				force
+			)
+
+	def reset_timestep(self) -> None:
+		self._accumulator = 0.0
+		self._last_update_time = None
+
+	def _capture_initial_state(self) -> None:
+		if self._initial_state is None and self._player is not None:
+			self._initial_state = self.snapshot()
+
+	def step(self) -> None:
+		"""advances the simulation by exactly one fixed step, without frame timing or interpolation"""
+
+		self._capture_initial_state()
+		self._fixed_update(self._fixed_dt)
+
+	def update(self, frame_time: float | None = None) -> None:
+		with self.profiler.scope('update'):
+			self._update(frame_time)
+
+	def _update(self, frame_time: float | None) -> None:
+		now = time.perf_counter()
+		if frame_time is None:
+			frame_time = self._fixed_dt if self._last_update_time is None else now - self._last_update_time
+		self._last_update_time = now
+
+		self._capture_initial_state()
+
+		self._accumulator += min(frame_time, self._max_physics_steps * self._fixed_dt)
+		while self._accumulator >= self._fixed_dt:
+			self._fixed_update(self._fixed_dt)
+			self._accumulator -= self._fixed_dt
+
+		self._physics_alpha = self._accumulator / self._fixed_dt
+		self.physics_world.interpolate(self._physics_alpha)
+
+		if self._camera is not None:
+			bag_screen_pos = self._player.get_bag_screen_position(self._physics_alpha)
+
+			if not self._player.is_game_over():
+				self._last_bag_screen_position = bag_screen_pos
+
+			target_pos = bag_screen_pos if not self._player.is_game_over() else self._last_bag_screen_position
+
+			if target_pos is not None:
+				self._camera.update(target_pos[0], target_pos[1])
+
+	def _fixed_update(self, dt: float) -> None:
+		with self.profiler.scope('physics'):
+			self.physics_world.step(dt)
+		self._sim_time += dt
+		self._step_index += 1
+
+		current_time = self._sim_time
+
+		with self.profiler.scope('particles'):
+			self._debris_particles.update()
 			self._confetti_particles.update()
-			if len(self._confetti_particles) == 0:
-				self._confetti_particles = None
-
-		if (self._snow_particles is not None
-			and len(self._snow_particles) < self._snow_density // 2):
-				if self._camera is not None:
-					cam_pos = self._camera.get_offset()
-				else:
-					cam_pos = (0, 0)
-				new_snow = create_snow(cam_pos, self.size, self._snow_density // 10)
-				for snowflake in new_snow:
-					self._snow_particles.add(snowflake)
 
 		if (not self._is_victory and self._finish_platform and not self._player.is_game_over()
 			and self._finish_platform.check_player_on_platform(self._player)):
 			self._is_victory = True
 			self._victory_time = current_time
+			self._invalidate_platform(self._finish_platform)
 			self._player.set_finished()
 			if self._sound_manager and not self._victory_sound_played:
 				self._sound_manager.play_sound('victory')
@@ -211,47 +545,61 @@ class Game:
 			bag_pos = self._player.get_bag_screen_position()
 			bag_size = self._player.get_bag_size()
 			left_vel, right_vel = self._player.get_parts_velocities()
-			debris_list = create_bag_debris(bag_pos, bag_size, self.size, left_vel, right_vel)
-			self._debris_particles = ObjectOrderedSet(*debris_list)
+			create_bag_debris(self._debris_particles, bag_pos, bag_size, self.size, left_vel, right_vel)
 			self._debris_spawned = True
 
 		if (self._is_victory and not self._confetti_spawned
 			and current_time - self._victory_time >= 1.6):
 			bag_pos = self._player.get_bag_screen_position()
-			confetti_list = create_confetti(bag_pos, self.size)
-			self._confetti_particles = ObjectOrderedSet(*confetti_list)
+			create_confetti(self._confetti_particles, bag_pos, self.size)
 			self._confetti_spawned = True
 
-		self._player.update(current_time)
-		self._platform_group.update()
+		with self.profiler.scope('player'):
+			self._player.update(current_time, dt)
 
-		if self._camera is not None:
-			bag_screen_pos = self._player.get_bag_screen_position()
+		# streamed per step rather than per frame, so the loaded bodies only depend on the step count
+		self._stream_level()
 
-			if not self._player.is_game_over():
-				self._last_bag_screen_position = bag_screen_pos
+		if self._rewind_buffer is not None:
+			self._rewind_buffer.record()
 
-			target_pos = bag_screen_pos if not self._player.is_game_over() else self._last_bag_screen_position
+	def render(self) -> None:
+		if self.simulation_only:
+			return
 
-			if target_pos is not None:
-				self._camera.update(target_pos[0], target_pos[1])
+		with self.profiler.scope('render'):
+			self._render()
 
-	def render(self) -> None:
+		if self._show_profiler:
+			self.profiler.draw(self._screen)
+
+		pygame.display.flip()
+		self.profiler.end_frame()
+
+	def get_visible_platforms(self) -> list:
+		if self._camera is not None and hasattr(self._platform_group, 'query'):
+			return self._platform_group.query(self._camera.get_view_rect(CULL_MARGIN))
+		return self._platform_group.sprites()
+
+	def _draw_platforms(self, surface: pygame.Surface) -> None:
+		if self._static_layer is not None:
+			self._static_layer.draw(surface, self._camera.get_view_rect())
+			return
+
+		surface.blits([(platform.image, platform.rect) for platform in self.get_visible_platforms()], False)
+
+	def _invalidate_platform(self, platform) -> None:
+		if self._static_layer is not None:
+			self._static_layer.invalidate(platform.rect)
+
+	def _render(self) -> None:
 		self._screen.fill(self._bg)
 
 		if self._snow_particles is not None:
 			cam_offset = self._camera.get_offset() if self._camera is not None else (0, 0)
-			for snowflake in self._snow_particles:
-				snow_x = int(snowflake.x - cam_offset[0])
-				snow_y = int(snowflake.y - cam_offset[1])
-				if 0 <= snow_x < self.size[0] and 0 <= snow_y < self.size[1]:
-					self._screen.set_at((snow_x, snow_y), '#ffffff')
-
-		for platform in self._platform_group:
-			if self._camera is not None:
-				self._screen.blit(platform.image, self._camera.apply(platform.rect))
-			else:
-				self._screen.blit(platform.image, platform.rect)
+			self._snow_particles.draw(self._screen, cam_offset)
+
+		self._draw_platforms(self._screen)
 
 		if self._camera is not None:
 			left_rect = self._camera.apply(self._player._left_part.rect)
@@ -265,65 +613,23 @@ class Game:
 			self._screen.blit(self._player._bag.image, self._player._bag.rect)
 			self._screen.blit(self._player._right_part.image, self._player._right_part.rect)
 
-		if self._debris_particles is not None:
-			debris_sorted = sorted(self._debris_particles, key=lambda obj: obj.depth)
-			for debris in debris_sorted:
-				if self._camera is not None:
-					debris_rect = pygame.Rect(
-						int(debris._x - debris._width / 2),
-						int(debris._y - debris._height / 2),
-						debris._width,
-						debris._height
-					)
-					adjusted_rect = self._camera.apply(debris_rect)
-					self._screen.blit(debris._surface, adjusted_rect.topleft)
-				else:
-					self._screen.blit(
-						debris._surface,
-						(
-							int(debris._x - debris._width / 2),
-							int(debris._y - debris._height / 2)
-						)
-					)
-
-		if self._confetti_particles is not None:
-			confetti_sorted = sorted(self._confetti_particles, key=lambda obj: obj.depth)
-			for confetto in confetti_sorted:
-				if self._camera is not None:
-					confetto_rect = pygame.Rect(
-						int(confetto._x - confetto._width / 2),
-						int(confetto._y - confetto._height / 2),
-						confetto._width,
-						confetto._height
-					)
-					adjusted_rect = self._camera.apply(confetto_rect)
-					self._screen.blit(confetto._surface, adjusted_rect.topleft)
-				else:
-					self._screen.blit(
-						confetto._surface,
-						(
-							int(confetto._x - confetto._width / 2),
-							int(confetto._y - confetto._height / 2)
-						)
-					)
+		cam_offset = self._camera.get_offset() if self._camera is not None else (0, 0)
+		self._debris_particles.draw(self._screen, cam_offset)
+		self._confetti_particles.draw(self._screen, cam_offset)
 
 		if self._is_game_over:
-			font = pygame.font.SysFont('', 48)
-			text = font.render('GAME OVER - Press R to restart', True, '#ff0000')
+			text = text_cache.render('GAME OVER - Press R to restart', 48, '#ff0000')
 			text_rect = text.get_rect(center=(self.size[0] // 2, self.size[1] // 2))
 			self._screen.blit(text, text_rect)
 
 		if self._is_victory:
-			font = pygame.font.SysFont('', 48)
-			text = font.render('VICTORY! - Press R to restart', True, '#00ff00')
+			text = text_cache.render('VICTORY! - Press R to restart', 48, '#00ff00')
 			text_rect = text.get_rect(center=(self.size[0] // 2, self.size[1] // 2))
 			self._screen.blit(text, text_rect)
 
 		if self._show_fps:
 			render_fps_counter(self._screen, self._clock)
 
-		pygame.display.flip()
-
 	def quit(self) -> None:
 		pygame.quit()
 		sys.exit()
@@ -0,0 +1,298 @@
+import json
+import os
+import struct
+import sys
+
+from Box2D import b2BodyDef, b2FixtureDef, b2PolygonShape
+import numpy as np
+import pygame
+
+from .platform import FinishPlatform, Platform
+
+
+LEVEL_VERSION = 1
+LEVEL_MAGIC = b'OTTL'
+DEFAULT_PLATFORM_COLOR = '#404040'
+
+PLATFORM_DTYPE = np.dtype([
+	('x', '<f4'),
+	('y', '<f4'),
+	('width', '<i4'),
+	('height', '<i4'),
+	('color', '<u4'),
+])
+
+# magic, version, flags, platform count, spawn, finish position, finish size, gravity, death zone, snow density
+HEADER = struct.Struct('<4sHHI2f2f2f2ffI')
+FLAG_SNOW = 1
+
+
+def parse_color(color: str) -> int:
+	color = pygame.Color(color)
+	return (color.r << 16) | (color.g << 8) | color.b
+
+
+def format_color(color: int) -> str:
+	return f'#{color:06x}'
+
+
+class Level:
+	"""platforms and world settings of a single level.
+
+	Platforms are kept as a structured NumPy array of `PLATFORM_DTYPE`, all
+	positions and sizes are in screen pixels, just like the `Platform` arguments
+	"""
+
+	def __init__(
+		self,
+		platforms: np.ndarray,
+		finish_position: tuple[int | float, int | float],
+		finish_size: tuple[int | float, int | float],
+		spawn: tuple[int | float, int | float],
+		gravity: tuple[int | float, int | float] = (0, -50),
+		death_zone_y: int | float = -1000,
+		enable_snow: bool = False,
+		snow_density: int = 100,
+	) -> None:
+		self.platforms = np.asarray(platforms, dtype=PLATFORM_DTYPE)
+		self.finish_position = tuple(finish_position)
+		self.finish_size = tuple(finish_size)
+		self.spawn = tuple(spawn)
+		self.gravity = tuple(gravity)
+		self.death_zone_y = death_zone_y
+		self.enable_snow = enable_snow
+		self.snow_density = snow_density
+		# set by `load_level`, lets input recordings name the level they were made on
+		self.path = None
+
+	def __len__(self) -> int:
+		return len(self.platforms)
+
+	def validate(self) -> None:
+		"""raises ValueError describing the first problem found.
+
+		Checks run over the whole platform array at once instead of per platform
+		"""
+
+		platforms = self.platforms
+		if len(platforms):
+			bad = ~(np.isfinite(platforms['x']) & np.isfinite(platforms['y']))
+			bad |= (platforms['width'] <= 0) | (platforms['height'] <= 0)
+			bad |= platforms['color'] > 0xffffff
+			if bad.any():
+				index = int(np.flatnonzero(bad)[0])
+				raise ValueError(f'Invalid platform #{index}: {platforms[index]}')
+
+		values = (*self.finish_position, *self.finish_size, *self.spawn, *self.gravity, self.death_zone_y)
+		if not np.all(np.isfinite(values)):
+			raise ValueError('Level settings must be finite numbers')
+		if self.finish_size[0] <= 0 or self.finish_size[1] <= 0:
+			raise ValueError(f'Invalid finish size: {self.finish_size}')
+		if self.snow_density < 0:
+			raise ValueError(f'Invalid snow density: {self.snow_density}')
+
+	@classmethod
+	def from_dict(cls, data: dict) -> 'Level':
+		platforms = data.get('platforms', [])
+		array = np.empty(len(platforms), dtype=PLATFORM_DTYPE)
+		if platforms:
+			array['x'], array['y'] = np.array([platform['position'] for platform in platforms], dtype=np.float32).T
+			array['width'], array['height'] = np.array([platform['size'] for platform in platforms], dtype=np.int32).T
+			array['color'] = [parse_color(platform.get('color', DEFAULT_PLATFORM_COLOR)) for platform in platforms]
+
+		finish = data['finish']
+		snow = data.get('snow', {})
+		return cls(
+			platforms=array,
+			finish_position=finish['position'],
+			finish_size=finish['size'],
+			spawn=data['spawn'],
+			gravity=data.get('gravity', (0, -50)),
+			death_zone_y=data.get('death_zone_y', -1000),
+			enable_snow=snow.get('enabled', False),
+			snow_density=snow.get('density', 100),
+		)
+
+	def to_dict(self) -> dict:
+		return {
+			'version': LEVEL_VERSION,
+			'spawn': list(self.spawn),
+			'gravity': list(self.gravity),
+			'death_zone_y': self.death_zone_y,
+			'snow': {'enabled': self.enable_snow, 'density': self.snow_density},
+			'finish': {'position': list(self.finish_position), 'size': list(self.finish_size)},
+			'platforms': [
+				{'position': [x, y], 'size': [width, height], 'color': format_color(color)}
+				for x, y, width, height, color in self.platforms.tolist()
+			],
+		}
+
+	@classmethod
+	def from_bytes(cls, data: bytes) -> 'Level':
+		if len(data) < HEADER.size:
+			raise ValueError('Level data is truncated')
+
+		(
+			magic, version, flags, count,
+			spawn_x, spawn_y,
+			finish_x, finish_y, finish_width, finish_height,
+			gravity_x, gravity_y,
+			death_zone_y, snow_density,
+		) = HEADER.unpack_from(data)
+
+		if magic != LEVEL_MAGIC:
+			raise ValueError('Not a compiled level')
+		if version != LEVEL_VERSION:
+			raise ValueError(f'Unsupported level version: {version}')
+		if len(data) != HEADER.size + count * PLATFORM_DTYPE.itemsize:
+			raise ValueError('Level data is truncated')
+
+		return cls(
+			platforms=np.frombuffer(data, dtype=PLATFORM_DTYPE, count=count, offset=HEADER.size),
+			finish_position=(finish_x, finish_y),
+			finish_size=(finish_width, finish_height),
+			spawn=(spawn_x, spawn_y),
+			gravity=(gravity_x, gravity_y),
+			death_zone_y=death_zone_y,
+			enable_snow=bool(flags & FLAG_SNOW),
+			snow_density=snow_density,
+		)
+
+	def to_bytes(self) -> bytes:
+		header = HEADER.pack(
+			LEVEL_MAGIC,
+			LEVEL_VERSION,
+			FLAG_SNOW if self.enable_snow else 0,
+			len(self.platforms),
+			*self.spawn,
+			*self.finish_position,
+			*self.finish_size,
+			*self.gravity,
+			self.death_zone_y,
+			self.snow_density,
+		)
+		return header + self.platforms.tobytes()
+
+
+def load_level(path: str) -> Level:
+	"""loads a `.json` authoring file or a compiled `.lvl` file"""
+
+	if os.path.splitext(path)[1] == '.json':
+		with open(path, encoding='utf-8') as file:
+			level = Level.from_dict(json.load(file))
+	else:
+		with open(path, 'rb') as file:
+			level = Level.from_bytes(file.read())
+
+	level.validate()
+	level.path = path
+	return level
+
+
+def save_level(level: Level, path: str) -> None:
+	level.validate()
+
+	if os.path.splitext(path)[1] == '.json':
+		with open(path, 'w', encoding='utf-8') as file:
+			json.dump(level.to_dict(), file, indent='\t')
+			file.write('\n')
+	else:
+		with open(path, 'wb') as file:
+			file.write(level.to_bytes())
+
+
+class PlatformBuilder:
+	"""creates static platforms from rows of a `PLATFORM_DTYPE` array.
+
+	Coordinates are converted for a whole array at once and Box2D definitions
+	are shared between bodies of the same size, so only `CreateBody` and
+	`CreateFixture` are left per platform. Level pixels are converted with the
+	screen height the builder was created with, so platforms created later
+	still line up after a resize
+	"""
+
+	def __init__(self, physics_world, screen_height: int | float | None = None) -> None:
+		self._physics_world = physics_world
+		self.screen_height = physics_world.screen_height if screen_height is None else screen_height
+		self._body_def = b2BodyDef()
+		self._body_def.type = 0
+		self._fixture_defs = {}
+		self._colors = {}
+
+	def _fixture_def(self, width: int, height: int) -> b2FixtureDef:
+		fixture_def = self._fixture_defs.get((width, height))
+		if fixture_def is None:
+			ppm = self._physics_world.ppm
+			fixture_def = b2FixtureDef(
+				shape=b2PolygonShape(box=(width / ppm / 2, height / ppm / 2)),
+				density=1.0,
+				friction=0.5,
+				restitution=0.1
+			)
+			self._fixture_defs[(width, height)] = fixture_def
+		return fixture_def
+
+	def _color_name(self, color: int) -> str:
+		color_name = self._colors.get(color)
+		if color_name is None:
+			color_name = self._colors[color] = format_color(color)
+		return color_name
+
+	def build(self, platforms: np.ndarray) -> list[Platform]:
+		physics_world = self._physics_world
+		ppm = physics_world.ppm
+		world_x = platforms['x'].astype(np.float64) / ppm
+		world_y = (self.screen_height - platforms['y'].astype(np.float64)) / ppm
+
+		body_def = self._body_def
+		create_body = physics_world.world.CreateBody
+		sprites = []
+
+		for x, y, width, height, color, body_x, body_y in zip(
+			platforms['x'].tolist(),
+			platforms['y'].tolist(),
+			platforms['width'].tolist(),
+			platforms['height'].tolist(),
+			platforms['color'].tolist(),
+			world_x.tolist(),
+			world_y.tolist(),
+			strict=True,
+		):
+			body_def.position = (body_x, body_y)
+			body = create_body(body_def)
+			body.CreateFixture(self._fixture_def(width, height))
+			sprites.append(Platform(physics_world, (x, y), (width, height), self._color_name(color), body=body))
+
+		return sprites
+
+
+def create_finish_platform(physics_world, level: Level) -> FinishPlatform:
+	return FinishPlatform(physics_world, level.finish_position, level.finish_size)
+
+
+def build_level(physics_world, level: Level, platform_group: pygame.sprite.Group) -> FinishPlatform:
+	"""creates every platform of `level` in `physics_world` and adds them to `platform_group`"""
+
+	sprites = PlatformBuilder(physics_world).build(level.platforms)
+	finish_platform = create_finish_platform(physics_world, level)
+	sprites.append(finish_platform)
+	platform_group.add(sprites)
+	return finish_platform
+
+
+def main(argv: list[str] | None = None) -> None:
+	"""compiles a JSON level into the binary format: `python -m src.level level.json level.lvl`"""
+
+	args = sys.argv[1:] if argv is None else argv
+	if len(args) != 2:
+		print('usage: python -m src.level <source.json> <target.lvl>')
+		sys.exit(2)
+
+	source, target = args
+	level = load_level(source)
+	save_level(level, target)
+	print(f'{source} -> {target}: {len(level)} platforms')
+
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,152 @@
+import numpy as np
+import pygame
+
+from .level import Level, PlatformBuilder
+
+
+class LevelStreamer:
+	"""keeps only the platforms around a few focus points alive in Box2D.
+
+	The level is split into square chunks of `chunk_size` level pixels.
+	Chunks within `load_radius` chunks of a focus point are created, chunks
+	further than `unload_radius` are destroyed along with their sprites, so
+	the broadphase and the step cost are bounded by the loaded window rather
+	than by the level size. At most `budget` bodies are created or destroyed
+	per `update`, except for the chunks right around a focus point, which are
+	always loaded at once so the player never falls through missing ground
+	"""
+
+	def __init__(
+		self,
+		physics_world,
+		level: Level,
+		platform_group: pygame.sprite.AbstractGroup,
+		chunk_size: int = 1024,
+		load_radius: int = 2,
+		unload_radius: int = 3,
+		budget: int = 256,
+		static_layer=None,
+	) -> None:
+		self._physics_world = physics_world
+		self._platform_group = platform_group
+		self._static_layer = static_layer
+		self._chunk_size = chunk_size
+		self._load_radius = load_radius
+		self._unload_radius = max(unload_radius, load_radius)
+		self._budget = budget
+		self._builder = PlatformBuilder(physics_world)
+		self._platforms = level.platforms
+
+		self._chunks = {}
+		if len(level.platforms):
+			chunk_x = np.floor_divide(level.platforms['x'], chunk_size).astype(np.int64)
+			chunk_y = np.floor_divide(level.platforms['y'], chunk_size).astype(np.int64)
+			order = np.lexsort((chunk_y, chunk_x))
+			keys = np.column_stack((chunk_x[order], chunk_y[order]))
+			starts = np.flatnonzero(np.any(np.diff(keys, axis=0), axis=1)) + 1
+			for indices in np.split(order, starts):
+				key = (int(chunk_x[indices[0]]), int(chunk_y[indices[0]]))
+				self._chunks[key] = indices
+
+		self._loaded = {}
+		# focus chunks of the last update that left nothing to load or unload
+		self._settled_keys = None
+
+	@property
+	def loaded_chunks(self) -> int:
+		return len(self._loaded)
+
+	@property
+	def loaded_bodies(self) -> int:
+		return sum(len(sprites) for sprites in self._loaded.values())
+
+	def _chunk_key(self, position: tuple[float, float]) -> tuple[int, int]:
+		return (int(position[0] // self._chunk_size), int(position[1] // self._chunk_size))
+
+	def world_to_level(self, world_pos: tuple[float, float]) -> tuple[float, float]:
+		"""converts Box2D meters into level pixels, which ignore later resizes"""
+
+		ppm = self._physics_world.ppm
+		return (world_pos[0] * ppm, self._builder.screen_height - world_pos[1] * ppm)
+
+	def _chunks_around(self, focus_keys: list[tuple[int, int]], radius: int) -> dict[tuple[int, int], int]:
+		"""returns level chunks within `radius` of any focus chunk, with their distance"""
+
+		distances = {}
+		for focus_x, focus_y in focus_keys:
+			for x in range(focus_x - radius, focus_x + radius + 1):
+				for y in range(focus_y - radius, focus_y + radius + 1):
+					key = (x, y)
+					if key in self._chunks:
+						distance = max(abs(x - focus_x), abs(y - focus_y))
+						distances[key] = min(distance, distances.get(key, distance))
+		return distances
+
+	def _invalidate(self, sprites: list) -> None:
+		if self._static_layer is not None and sprites:
+			self._static_layer.invalidate(sprites[0].rect.unionall([sprite.rect for sprite in sprites[1:]]))
+
+	def _load(self, key: tuple[int, int], limit: int | None) -> int:
+		indices = self._chunks[key]
+		sprites = self._loaded.setdefault(key, [])
+		start = len(sprites)
+		end = len(indices) if limit is None else min(len(indices), start + limit)
+		if end <= start:
+			return 0
+
+		created = self._builder.build(self._platforms[indices[start:end]])
+		sprites.extend(created)
+		self._platform_group.add(created)
+		self._invalidate(created)
+		return len(created)
+
+	def _unload(self, key: tuple[int, int], limit: int | None) -> int:
+		sprites = self._loaded[key]
+		count = len(sprites) if limit is None else min(len(sprites), limit)
+		removed = sprites[len(sprites) - count:]
+		del sprites[len(sprites) - count:]
+		if not sprites:
+			del self._loaded[key]
+
+		self._physics_world.destroy_bodies(removed)
+		self._platform_group.remove(removed)
+		self._invalidate(removed)
+		return count
+
+	def update(self, focus_points: list[tuple[float, float]], force: bool = False) -> None:
+		"""streams chunks around `focus_points` given in Box2D meters.
+
+		With `force` the budget is ignored, which is meant for spawns and level
+		loads where the whole window has to be ready before the next step
+		"""
+
+		focus_keys = [self._chunk_key(self.world_to_level(point)) for point in focus_points]
+		if focus_keys == self._settled_keys:
+			# the same window is already fully streamed, so another pass would change nothing
+			return
+
+		wanted = self._chunks_around(focus_keys, self._load_radius)
+		keep = self._chunks_around(focus_keys, self._unload_radius)
+		budget = None if force else self._budget
+
+		for key, distance in sorted(wanted.items(), key=lambda item: item[1]):
+			if distance <= 1 or budget is None:
+				self._load(key, None)
+			elif budget > 0:
+				budget -= self._load(key, budget)
+
+		for key in [key for key in self._loaded if key not in keep]:
+			if budget is None:
+				self._unload(key, None)
+			elif budget > 0:
+				budget -= self._unload(key, budget)
+
+		settled = all(key in keep for key in self._loaded) and all(
+			len(self._loaded.get(key, ())) == len(self._chunks[key]) for key in wanted
+		)
+		self._settled_keys = focus_keys if settled else None
+
+	def unload_all(self) -> None:
+		self._settled_keys = None
+		for key in list(self._loaded):
+			self._unload(key, None)
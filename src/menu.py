@@ -11,9 +11,14 @@ FOG_TEXT = '#e8e8f0'
 
 
 class MainMenu:
-	def __init__(self, screen_size: tuple[int, int] = (1280, 720)) -> None:
+	def __init__(self, screen_size: tuple[int, int] = (1280, 720), session=None) -> None:
+		"""with a `DisplaySession` the menu is drawn offscreen and presented through
+		its GL context, so the window survives the switch to the game
+		"""
+
 		self.screen_size = screen_size
 		self.screen = None
+		self.session = session
 		self.clock = pygame.time.Clock()
 		self.start_game = False
 		self.quit_game = False
@@ -26,8 +31,13 @@ class MainMenu:
 		self.quit_game = True
 
 	def run(self) -> str:
-		self.screen = pygame.display.set_mode(self.screen_size, pygame.FULLSCREEN)
-		pygame.display.set_caption('Раз, два, взяли')
+		if self.session is not None:
+			self.session.open('Раз, два, взяли')
+			self.screen_size = self.session.size
+			self.screen = pygame.Surface(self.screen_size, 0, 32)
+		else:
+			self.screen = pygame.display.set_mode(self.screen_size, pygame.FULLSCREEN)
+			pygame.display.set_caption('Раз, два, взяли')
 
 		cx = self.screen_size[0] // 2
 		cy = self.screen_size[1] // 2
@@ -84,7 +94,10 @@ class MainMenu:
 
 			self.screen.fill('#1a1a1a')
 			self.container.draw(self.screen)
-			pygame.display.flip()
+			if self.session is not None:
+				self.session.present(self.screen)
+			else:
+				pygame.display.flip()
 			self.clock.tick(60)
 
 			if self.start_game:
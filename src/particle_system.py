@@ -0,0 +1,290 @@
+import numpy as np
+import pygame
+
+from .sprite_cache import SpriteCache, sprite_cache as default_sprite_cache
+
+
+FLOAT_FIELDS = (
+	'x',
+	'y',
+	'velocity_x',
+	'velocity_y',
+	'z',
+	'z_velocity',
+	'z_damping',
+	'rotation',
+	'rotation_speed',
+	'alpha',
+	'fade_speed',
+	'gravity',
+	'damping',
+)
+
+INT_FIELDS = (
+	'width',
+	'height',
+	'color',
+	'bucket',
+)
+
+
+class ParticleSystem:
+	"""struct-of-arrays storage for short-lived rectangle particles.
+
+	Every attribute lives in its own contiguous NumPy array, the first
+	`len(self)` entries of which are alive. Draw order is kept by a small
+	number of depth buckets and only re-sorted when a particle changes bucket
+	"""
+
+	def __init__(
+		self,
+		capacity: int = 256,
+		seed: int | None = None,
+		min_z: float = 0.1,
+		max_z: float = 2.5,
+		sprite_cache: SpriteCache | None = None,
+		depth_buckets: int = 8,
+	) -> None:
+		self.rng = np.random.default_rng(seed)
+		self._min_z = min_z
+		self._max_z = max_z
+		self._count = 0
+		# total number of particles ever emitted, tells `RewindBuffer` when a keyframe is needed
+		self.emitted = 0
+		self._depth_buckets = max(1, depth_buckets)
+		self._order = np.zeros(0, dtype=np.int64)
+		self._order_dirty = False
+		self._colors = []
+		self._color_ids = {}
+		self._sprite_cache = sprite_cache if sprite_cache is not None else default_sprite_cache
+		self._allocate(capacity)
+
+	def __len__(self) -> int:
+		return self._count
+
+	def _allocate(self, capacity: int) -> None:
+		old_count = self._count
+		for name in FLOAT_FIELDS:
+			array = np.zeros(capacity, dtype=np.float64)
+			if old_count:
+				array[:old_count] = getattr(self, name)[:old_count]
+			setattr(self, name, array)
+
+		for name in INT_FIELDS:
+			array = np.zeros(capacity, dtype=np.int32)
+			if old_count:
+				array[:old_count] = getattr(self, name)[:old_count]
+			setattr(self, name, array)
+
+		self._capacity = capacity
+
+	def reseed(self, seed: int | None) -> None:
+		self.rng = np.random.default_rng(seed)
+
+	def color_id(self, color: str) -> int:
+		color_id = self._color_ids.get(color)
+		if color_id is None:
+			color_id = len(self._colors)
+			self._colors.append(tuple(pygame.Color(color)))
+			self._color_ids[color] = color_id
+		return color_id
+
+	def get_color(self, color_id: int) -> pygame.Color:
+		return pygame.Color(self._colors[color_id])
+
+	def clear(self) -> None:
+		self._count = 0
+		self._order = self._order[:0]
+		self._order_dirty = False
+
+	def snapshot(self) -> dict:
+		"""copies the live particles and the generator state, see `restore`"""
+
+		count = self._count
+		state = {name: getattr(self, name)[:count].copy() for name in FLOAT_FIELDS + INT_FIELDS}
+		state['count'] = count
+		state['order'] = self._order.copy()
+		state['order_dirty'] = self._order_dirty
+		state['rng'] = self.rng.bit_generator.state
+		return state
+
+	def restore(self, snapshot: dict) -> None:
+		count = snapshot['count']
+		if count > self._capacity:
+			self._allocate(max(count, self._capacity * 2))
+
+		for name in FLOAT_FIELDS + INT_FIELDS:
+			getattr(self, name)[:count] = snapshot[name]
+		self._count = count
+		self._order = snapshot['order'].copy()
+		self._order_dirty = snapshot['order_dirty']
+		self.rng.bit_generator.state = snapshot['rng']
+
+	def _depth_bucket(self, depths: np.ndarray) -> np.ndarray:
+		relative = (depths - self._min_z) / (self._max_z - self._min_z)
+		return np.clip((relative * self._depth_buckets).astype(np.int32), 0, self._depth_buckets - 1)
+
+	def emit(
+		self,
+		x: np.ndarray,
+		y: np.ndarray,
+		velocity_x: np.ndarray,
+		velocity_y: np.ndarray,
+		width: np.ndarray,
+		height: np.ndarray,
+		color: np.ndarray,
+		rotation: np.ndarray | float = 0.0,
+		rotation_speed: np.ndarray | float = 0.0,
+		damping: np.ndarray | float = 0.98,
+		gravity: np.ndarray | float = 0.3,
+		fade_speed: np.ndarray | float = 1.5,
+		z: np.ndarray | float = 1.0,
+		z_velocity: np.ndarray | float = 0.0,
+		z_damping: np.ndarray | float = 0.98,
+	) -> None:
+		amount = len(x)
+		if amount == 0:
+			return
+
+		required = self._count + amount
+		if required > self._capacity:
+			self._allocate(max(required, self._capacity * 2))
+
+		values = {
+			'x': x,
+			'y': y,
+			'velocity_x': velocity_x,
+			'velocity_y': velocity_y,
+			'z': z,
+			'z_velocity': z_velocity,
+			'z_damping': z_damping,
+			'rotation': rotation,
+			'rotation_speed': rotation_speed,
+			'alpha': 255.0,
+			'fade_speed': fade_speed,
+			'gravity': gravity,
+			'damping': damping,
+			'width': width,
+			'height': height,
+			'color': color,
+		}
+
+		start, end = self._count, required
+		for name, value in values.items():
+			getattr(self, name)[start:end] = value
+		self.bucket[start:end] = self._depth_bucket(self.z[start:end])
+
+		self._count = required
+		self._order_dirty = True
+		self.emitted += amount
+
+	def _compact(self, alive: np.ndarray) -> None:
+		count = self._count
+		for name in FLOAT_FIELDS + INT_FIELDS:
+			array = getattr(self, name)
+			survivors = array[:count][alive]
+			array[:len(survivors)] = survivors
+		self._count = int(np.count_nonzero(alive))
+
+		if not self._order_dirty:
+			# survivors keep their relative order, so the draw order is remapped instead of re-sorted
+			new_index = np.cumsum(alive) - 1
+			self._order = new_index[self._order[alive[self._order]]]
+
+	def update(self) -> None:
+		count = self._count
+		if count == 0:
+			return
+
+		live = slice(0, count)
+		damping = self.damping[live]
+
+		self.velocity_y[live] += self.gravity[live]
+		self.velocity_x[live] *= damping
+		self.velocity_y[live] *= damping
+		self.z_velocity[live] *= self.z_damping[live]
+
+		self.x[live] += self.velocity_x[live]
+		self.y[live] += self.velocity_y[live]
+		self.z[live] += self.z_velocity[live]
+		np.clip(self.z[live], self._min_z, self._max_z, out=self.z[live])
+
+		buckets = self._depth_bucket(self.z[live])
+		if not self._order_dirty and np.any(buckets != self.bucket[live]):
+			self._order_dirty = True
+		self.bucket[live] = buckets
+
+		self.rotation[live] += self.rotation_speed[live]
+		self.rotation_speed[live] *= 0.99
+
+		self.alpha[live] -= self.fade_speed[live]
+
+		alive = self.alpha[live] > 0
+		if not alive.all():
+			self._compact(alive)
+
+	def _draw_order(self) -> np.ndarray:
+		if self._order_dirty:
+			self._order = np.argsort(self.bucket[:self._count], kind='stable')
+			self._order_dirty = False
+		return self._order
+
+	def get_quads(self, cam_offset: tuple[int, int] = (0, 0)) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+		"""returns screen centers, sizes, angles in degrees and RGBA colors in the 0-1 range.
+
+		Rows are in draw order and follow `draw`: sizes scale with depth and
+		particles that barely spin are drawn unrotated
+		"""
+
+		count = self._count
+		if count == 0:
+			empty = np.zeros((0, 2), dtype=np.float32)
+			return empty, empty, np.zeros(0, dtype=np.float32), np.zeros((0, 4), dtype=np.float32)
+
+		order = self._draw_order()
+		depth = self.z[order]
+
+		centers = np.column_stack((self.x[order] - cam_offset[0], self.y[order] - cam_offset[1]))
+		sizes = np.column_stack((
+			np.maximum(1.0, self.width[order] * depth),
+			np.maximum(1.0, self.height[order] * depth),
+		))
+		angles = np.where(np.abs(self.rotation_speed[order]) <= 0.01, 0.0, self.rotation[order])
+
+		colors = np.empty((count, 4), dtype=np.float32)
+		colors[:, :3] = np.asarray(self._colors, dtype=np.float32)[self.color[order], :3] / 255.0
+		colors[:, 3] = np.clip(self.alpha[order], 0.0, 255.0) / 255.0
+
+		return centers, sizes, angles, colors
+
+	def draw(self, surface: pygame.Surface, cam_offset: tuple[int, int] = (0, 0)) -> None:
+		count = self._count
+		if count == 0:
+			return
+
+		ox, oy = cam_offset
+		cache = self._sprite_cache
+		order = self._draw_order()
+
+		angle_index = cache.quantize_angles(self.rotation[:count])
+		angle_index[np.abs(self.rotation_speed[:count]) <= 0.01] = -1
+		z_index = cache.quantize_depths(self.z[:count])
+
+		colors = self._colors
+		get_sprite = cache.get
+		blit = surface.blit
+
+		for color_id, width, height, angle, depth, alpha, x, y in zip(
+			self.color[order].tolist(),
+			self.width[order].tolist(),
+			self.height[order].tolist(),
+			angle_index[order].tolist(),
+			z_index[order].tolist(),
+			self.alpha[order].astype(np.int32).tolist(),
+			self.x[order].tolist(),
+			self.y[order].tolist(),
+			strict=True,
+		):
+			sprite = get_sprite(colors[color_id], width, height, angle, depth)
+			sprite.set_alpha(alpha)
+			blit(sprite, (int(x - sprite.get_width() / 2) - ox, int(y - sprite.get_height() / 2) - oy))
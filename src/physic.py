@@ -1,23 +1,185 @@
-from Box2D import b2World, b2Vec2, b2PolygonShape, b2CircleShape, b2BodyDef, b2FixtureDef
+from collections import Counter
+
+from Box2D import b2ContactListener, b2World, b2Vec2, b2PolygonShape, b2CircleShape, b2BodyDef, b2FixtureDef
+import numpy as np
 import pygame
 
 
+BODY_STATE_DTYPE = np.dtype([
+	('position', '<f8', 2),
+	('angle', '<f8'),
+	('velocity', '<f8', 2),
+	('angular_velocity', '<f8'),
+	('linear_damping', '<f4'),
+	('awake', '?'),
+])
+
+class ContactManifold:
+	"""world manifold of a touching contact, as `contact.worldManifold` returns it.
+
+	`body_a` and `body_b` are the `PhysicsBody` wrappers of the contact's
+	bodies. The normal points from the first to the second, `points`
+	always holds Box2D's two manifold slots, like the SWIG accessor
+	"""
+
+	__slots__ = ('body_a', 'body_b', 'normal', 'points')
+
+	def __init__(self, body_a, body_b) -> None:
+		self.body_a = body_a
+		self.body_b = body_b
+		self.normal = (0.0, 0.0)
+		self.points = ()
+
+	def update(self, contact) -> None:
+		world_manifold = contact.worldManifold
+		self.normal = tuple(world_manifold.normal)
+		self.points = world_manifold.points
+
+
+class ContactTracker(b2ContactListener):
+	"""follows touching contacts as Box2D reports them, so nothing scans contact lists.
+
+	`BeginContact`/`EndContact` keep the bodies each body touches. For bodies
+	passed to `watch` the world manifold of every touching contact is kept as
+	well and refreshed in `PostSolve`, once the solver has moved the bodies, so
+	it matches what `contact.worldManifold` returns after the step. Bodies are
+	tracked by the id `PhysicsWorld` stores in `b2Body.userData` and handed out
+	as their `PhysicsBody` wrappers, bodies created behind the world's back are
+	ignored. Contacts are keyed by their Box2D pointer, the SWIG wrappers
+	differ between callbacks
+	"""
+
+	def __init__(self, physics_world: 'PhysicsWorld') -> None:
+		super().__init__()
+		self._physics_world = physics_world
+		self._touching = {}
+		self._watched = set()
+		self._manifolds = {}
+		self._body_manifolds = {}
+
+	def watch(self, body) -> None:
+		"""starts keeping manifolds for `body`, from the next contact it begins"""
+
+		self._watched.add(body.id)
+
+	def unwatch(self, body) -> None:
+		self._watched.discard(body.id)
+
+	def touching(self, body) -> list:
+		"""returns the bodies `body` touches"""
+
+		get_body_by_id = self._physics_world.get_body_by_id
+		return [get_body_by_id(other) for other in self._touching.get(body.id, ())]
+
+	def is_touching(self, body, other) -> bool:
+		touching = self._touching.get(body.id)
+		return touching is not None and other.id in touching
+
+	def manifolds(self, body):
+		"""returns the manifolds of the touching contacts of a watched `body`"""
+
+		manifolds = self._body_manifolds.get(body.id)
+		return manifolds.values() if manifolds is not None else ()
+
+	def _add_touching(self, body, other) -> None:
+		touching = self._touching.get(body)
+		if touching is None:
+			touching = self._touching[body] = Counter()
+		touching[other] += 1
+
+	def _remove_touching(self, body, other) -> None:
+		touching = self._touching[body]
+		touching[other] -= 1
+		if touching[other] <= 0:
+			del touching[other]
+			if not touching:
+				# ids are never reused, but bodies come and go with streaming, so no empty entry is kept
+				del self._touching[body]
+
+	def BeginContact(self, contact) -> None:
+		id_a = contact.fixtureA.body.userData
+		id_b = contact.fixtureB.body.userData
+		if id_a is None or id_b is None:
+			return
+		self._add_touching(id_a, id_b)
+		self._add_touching(id_b, id_a)
+
+		watched = [body_id for body_id in (id_a, id_b) if body_id in self._watched]
+		if watched:
+			key = hash(contact)
+			get_body_by_id = self._physics_world.get_body_by_id
+			manifold = self._manifolds[key] = ContactManifold(get_body_by_id(id_a), get_body_by_id(id_b))
+			manifold.update(contact)
+			for body_id in watched:
+				self._body_manifolds.setdefault(body_id, {})[key] = manifold
+
+	def EndContact(self, contact) -> None:
+		id_a = contact.fixtureA.body.userData
+		id_b = contact.fixtureB.body.userData
+		if id_a is None or id_b is None:
+			return
+		self._remove_touching(id_a, id_b)
+		self._remove_touching(id_b, id_a)
+
+		key = hash(contact)
+		manifold = self._manifolds.pop(key, None)
+		if manifold is not None:
+			for body_id in (id_a, id_b):
+				manifolds = self._body_manifolds.get(body_id)
+				if manifolds is not None:
+					manifolds.pop(key, None)
+					if not manifolds:
+						del self._body_manifolds[body_id]
+
+	def PostSolve(self, contact, impulse) -> None:
+		manifold = self._manifolds.get(hash(contact))
+		if manifold is not None:
+			manifold.update(contact)
+
+
 class PhysicsWorld:
+	"""owns the Box2D world and indexes the `PhysicsBody` wrappers living in it.
+
+	Bodies are registered by their `b2Body` and by a stable integer id that is
+	also stored in `b2Body.userData`, which `ContactTracker` maps back to the
+	wrapper, so adding, removing and looking up a body are O(1). Every index
+	keeps creation order, which the snapshot layout relies on
+	"""
+
 	def __init__(
 		self,
 		gravity: tuple[int | float, int | float] = (0, -10),
 		ppm: int = 20,
-		screen_height: int = 720
+		screen_height: int = 720,
+		simulation_only: bool = False,
 	) -> None:
-		self.world = b2World(gravity=b2Vec2(*gravity), doSleep=True)
+		self.contacts = ContactTracker(self)
+		self.world = b2World(gravity=b2Vec2(*gravity), doSleep=True, contactListener=self.contacts)
 		self.ppm = ppm
 		self.screen_height = screen_height
-		self.bodies = []
+		# bodies get no image and never sync their rect, so no display or Surface is needed
+		self.simulation_only = simulation_only
+		self._bodies = {}
+		self._bodies_by_id = {}
+		# kinematic and dynamic bodies together, in creation order
+		self._interpolated_bodies = {}
+		# `dynamic_bodies`, rebuilt only when a body is added or removed
+		self._dynamic_bodies = ()
+		self._next_body_id = 1
 
 	def step(self, dt: float = 1.0/60.0, vel_iters: int = 8, pos_iters: int = 3) -> None:
+		for body in self._interpolated_bodies.values():
+			body.store_previous_transform()
+
 		self.world.Step(dt, vel_iters, pos_iters)
 		self.world.ClearForces()
 
+	def interpolate(self, alpha: float) -> None:
+		if self.simulation_only:
+			return
+		for body in self._interpolated_bodies.values():
+			body._update_sprite_position(alpha)
+
 	def pixels_to_meters(self, pixels: int | float) -> float:
 		return pixels / self.ppm
 
@@ -37,12 +199,73 @@ class PhysicsWorld:
 		y = self.screen_height - self.meters_to_pixels(world_pos[1])
 		return (x, y)
 
+	@property
+	def bodies(self):
+		"""every registered body, as a read-only view in creation order"""
+
+		return self._bodies.values()
+
+	def __len__(self) -> int:
+		return len(self._bodies)
+
+	def get_body_by_id(self, body_id: int):
+		"""returns the `PhysicsBody` with `body_id`, the id `ContactTracker` reads from `b2Body.userData`"""
+
+		return self._bodies_by_id.get(body_id)
+
 	def add_body(self, body) -> None:
-		self.bodies.append(body)
+		b2body = body.body
+		body.id = self._next_body_id
+		self._next_body_id += 1
+		b2body.userData = body.id
+
+		self._bodies[b2body] = body
+		self._bodies_by_id[body.id] = body
+		if b2body.type != 0:
+			self._interpolated_bodies[b2body] = body
+			self._dynamic_bodies = tuple(self._interpolated_bodies.values())
+
+	def set_gravity(self, gravity: tuple[int | float, int | float]) -> None:
+		self.world.gravity = b2Vec2(*gravity)
+
+	def destroy_bodies(self, bodies) -> None:
+		"""destroys many bodies, in the given order and each only once"""
+
+		for body in dict.fromkeys(bodies):
+			self.world.DestroyBody(body.body)
+			self.remove_body(body)
+
+	@property
+	def dynamic_bodies(self) -> tuple:
+		"""kinematic and dynamic bodies in creation order, the same tuple until one is added or removed"""
+
+		return self._dynamic_bodies
+
+	def snapshot(self, out: np.ndarray | None = None) -> np.ndarray:
+		"""captures every dynamic body into a `BODY_STATE_DTYPE` array, static bodies never move"""
+
+		if out is None:
+			out = np.empty(len(self._interpolated_bodies), dtype=BODY_STATE_DTYPE)
+		for index, body in enumerate(self._interpolated_bodies.values()):
+			out[index] = body.get_state()
+		return out
+
+	def restore(self, snapshot: np.ndarray) -> None:
+		"""expects the same dynamic bodies, in the same order, as when `snapshot` was taken"""
+
+		for body, state in zip(self._interpolated_bodies.values(), snapshot.tolist(), strict=True):
+			body.set_state(state)
 
 	def remove_body(self, body) -> None:
-		if body in self.bodies:
-			self.bodies.remove(body)
+		"""unregisters `body`, the `b2Body` itself is left to the caller"""
+
+		b2body = body.body
+		if self._bodies.pop(b2body, None) is None:
+			return
+		self.contacts.unwatch(body)
+		del self._bodies_by_id[body.id]
+		if self._interpolated_bodies.pop(b2body, None) is not None:
+			self._dynamic_bodies = tuple(self._interpolated_bodies.values())
 
 
 class PhysicsBody(pygame.sprite.Sprite):
@@ -55,14 +278,48 @@ class PhysicsBody(pygame.sprite.Sprite):
 		shape_type: str = 'box',
 		density: float = 1.0,
 		friction: float = 0.3,
-		restitution: float = 0.1
+		restitution: float = 0.1,
+		body=None,
 	) -> None:
 		super().__init__()
 
 		self.physics_world = physics_world
 		self.size = size
 		self.ppm = physics_world.ppm
+		# assigned by `PhysicsWorld.add_body`, also stored in `b2Body.userData`
+		self.id = None
+
+		if body is None:
+			self.body = self._create_body(
+				position, size, body_type, shape_type, density, friction, restitution
+			)
+		else:
+			self.body = body
+
+		if physics_world.simulation_only:
+			# the rect is still placed once, the spatial grid and level streaming look platforms up by it
+			self.image = None
+			self.rect = pygame.Rect(0, 0, int(size[0]), int(size[1]))
+		else:
+			self.image = self._create_image()
+			self.rect = self.image.get_rect()
+
+		self.store_previous_transform()
+		physics_world.add_body(self)
+
+		self._update_sprite_position()
 
+	def _create_body(
+		self,
+		position: tuple[int | float, int | float],
+		size: tuple[int | float, int | float],
+		body_type: str,
+		shape_type: str,
+		density: float,
+		friction: float,
+		restitution: float,
+	):
+		physics_world = self.physics_world
 		pos_meters = physics_world.screen_to_world(position)
 
 		size_meters = (
@@ -80,7 +337,7 @@ class PhysicsBody(pygame.sprite.Sprite):
 		elif body_type == 'kinematic':
 			body_def.type = 1
 
-		self.body = physics_world.world.CreateBody(body_def)
+		body = physics_world.world.CreateBody(body_def)
 
 		if shape_type == 'box':
 			shape = b2PolygonShape(box=size_meters)
@@ -92,7 +349,7 @@ class PhysicsBody(pygame.sprite.Sprite):
 				restitution=restitution
 			)
 
-			self.body.CreateFixture(fixture_def)
+			body.CreateFixture(fixture_def)
 		elif shape_type == 'circle':
 			radius = min(size_meters)
 			shape = b2CircleShape(radius=radius)
@@ -104,20 +361,60 @@ class PhysicsBody(pygame.sprite.Sprite):
 				restitution=restitution
 			)
 
-			self.body.CreateFixture(fixture_def)
+			body.CreateFixture(fixture_def)
 
-		self.image = pygame.Surface(size, pygame.SRCALPHA)
-		self.rect = self.image.get_rect()
+		return body
 
-		physics_world.add_body(self)
+	def _create_image(self) -> pygame.Surface:
+		return pygame.Surface(self.size, pygame.SRCALPHA)
 
-		self._update_sprite_position()
+	def store_previous_transform(self) -> None:
+		pos = self.body.position
+		self._previous_position = (pos.x, pos.y)
 
-	def _update_sprite_position(self) -> None:
+	def get_interpolated_position(self, alpha: float = 1.0) -> tuple[float, float]:
 		pos = self.body.position
-		pixel_pos = self.physics_world.world_to_screen((pos.x, pos.y))
+		if alpha >= 1.0:
+			return (pos.x, pos.y)
+
+		prev_x, prev_y = self._previous_position
+		return (
+			prev_x + (pos.x - prev_x) * alpha,
+			prev_y + (pos.y - prev_y) * alpha
+		)
+
+	def _update_sprite_position(self, alpha: float = 1.0) -> None:
+		pos = self.get_interpolated_position(alpha)
+		pixel_pos = self.physics_world.world_to_screen(pos)
 		self.rect.center = pixel_pos
 
+	def get_state(self) -> tuple:
+		body = self.body
+		position = body.position
+		velocity = body.linearVelocity
+		return (
+			(position.x, position.y),
+			body.angle,
+			(velocity.x, velocity.y),
+			body.angularVelocity,
+			body.linearDamping,
+			body.awake,
+		)
+
+	def set_state(self, state: tuple) -> None:
+		"""moves the body back to a `get_state` result without recreating it"""
+
+		position, angle, velocity, angular_velocity, linear_damping, awake = state
+		body = self.body
+		body.transform = (b2Vec2(float(position[0]), float(position[1])), float(angle))
+		body.linearVelocity = b2Vec2(float(velocity[0]), float(velocity[1]))
+		body.angularVelocity = float(angular_velocity)
+		body.linearDamping = float(linear_damping)
+		body.awake = bool(awake)
+		self.store_previous_transform()
+		if not self.physics_world.simulation_only:
+			self._update_sprite_position()
+
 	def apply_force(self, force: tuple[int | float, int | float]) -> None:
 		self.body.ApplyForce(b2Vec2(*force), self.body.worldCenter, True)
 
@@ -132,7 +429,8 @@ class PhysicsBody(pygame.sprite.Sprite):
 		return (vel.x, vel.y)
 
 	def update(self) -> None:
-		self._update_sprite_position()
+		if not self.physics_world.simulation_only:
+			self._update_sprite_position()
 
 	def destroy(self) -> None:
 		self.physics_world.world.DestroyBody(self.body)
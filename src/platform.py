@@ -3,6 +3,22 @@ import pygame
 from .physic import PhysicsBody
 
 
+_platform_images = {}
+
+
+def platform_image(size: tuple[int | float, int | float], color: str) -> pygame.Surface:
+	"""returns the image shared by every platform of this size and colour"""
+
+	key = (tuple(size), color)
+	image = _platform_images.get(key)
+	if image is None:
+		image = pygame.Surface(size, pygame.SRCALPHA)
+		image.fill(color)
+		pygame.draw.rect(image, '#606060', (0, 0, size[0], size[1]), 2)
+		_platform_images[key] = image
+	return image
+
+
 class Platform(PhysicsBody):
 	def __init__(
 		self,
@@ -10,21 +26,21 @@ class Platform(PhysicsBody):
 		position: tuple[int | float, int | float],
 		size: tuple[int | float, int | float],
 		color: str = '#404040',
+		body=None,
 	) -> None:
+		self._color = color
 		super().__init__(
 			physics_world=physics_world,
 			position=position,
 			size=size,
 			body_type='static',
 			shape_type='box',
-			friction=0.5
+			friction=0.5,
+			body=body,
 		)
-		self._color = color
-		self._render()
 
-	def _render(self) -> None:
-		self.image.fill(self._color)
-		pygame.draw.rect(self.image, '#606060', (0, 0, self.size[0], self.size[1]), 2)
+	def _create_image(self) -> pygame.Surface:
+		return platform_image(self.size, self._color)
 
 
 class FinishPlatform(Platform):
@@ -46,20 +62,9 @@ class FinishPlatform(Platform):
 		if self._has_triggered:
 			return False
 
-		left_touching = False
-		right_touching = False
-
-		for contact_edge in self.body.contacts:
-			contact = contact_edge.contact
-			if not contact.touching:
-				continue
-
-			other_body = contact_edge.other
-
-			if other_body == player._left_part.body:
-				left_touching = True
-			elif other_body == player._right_part.body:
-				right_touching = True
+		contacts = self.physics_world.contacts
+		left_touching = contacts.is_touching(self, player._left_part)
+		right_touching = contacts.is_touching(self, player._right_part)
 
 		if left_touching and right_touching and not player.is_game_over():
 			self._has_triggered = True
@@ -67,5 +72,13 @@ class FinishPlatform(Platform):
 
 		return False
 
+	@property
+	def has_triggered(self) -> bool:
+		return self._has_triggered
+
+	@has_triggered.setter
+	def has_triggered(self, value: bool) -> None:
+		self._has_triggered = value
+
 	def reset(self) -> None:
 		self._has_triggered = False
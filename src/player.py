@@ -2,11 +2,64 @@ import math
 import random
 
 from Box2D import b2Vec2, b2DistanceJointDef, b2PolygonShape, b2FixtureDef
+import numpy as np
 import pygame
 
+from .assets import assets
 from .physic import PhysicsBody
 
 
+# why a bag tore, in the order `CourierBag.tear_cause` codes are stored in snapshots
+TEAR_CAUSES = ('distance', 'desync', 'both_keys', 'death_zone')
+
+# one record per snapshot, bodies are stored separately by `PhysicsWorld.snapshot`
+PLAYER_STATE_DTYPE = np.dtype([
+	('initial_position', '<f8', 2),
+	('desync_timer', '<i4'),
+	('last_stretch_sound_time', '<f8'),
+	('left_on_ground', '?'),
+	('right_on_ground', '?'),
+	('left_jumps', '<i4'),
+	('right_jumps', '<i4'),
+	('spawn_locked', '?'),
+	('spawn_lock_frames', '<i4'),
+	('bag_tear_animation_done', '?'),
+	('explosion_applied', '?'),
+	('is_finished', '?'),
+	('explosion_sound_played', '?'),
+	('is_moving', '?'),
+	# move, jump
+	('left_keys', '?', 2),
+	('right_keys', '?', 2),
+	# facing right, walk offset, walk time
+	('left_part', '<f8', 3),
+	('right_part', '<f8', 3),
+	# torn, tearing, tear scale, tear alpha
+	('bag', '<f8', 4),
+	# 1 + index into `TEAR_CAUSES`, 0 while the bag is intact
+	('tear_cause', '<i1'),
+	# NaN once the joints are destroyed
+	('joint_lengths', '<f8', 2),
+])
+
+# scalar fields of `PLAYER_STATE_DTYPE` that map to `Player._<name>`
+PLAYER_STATE_FIELDS = (
+	'desync_timer',
+	'last_stretch_sound_time',
+	'left_on_ground',
+	'right_on_ground',
+	'left_jumps',
+	'right_jumps',
+	'spawn_locked',
+	'spawn_lock_frames',
+	'bag_tear_animation_done',
+	'explosion_applied',
+	'is_finished',
+	'explosion_sound_played',
+	'is_moving',
+)
+
+
 class PlayerPart(PhysicsBody):
 	def __init__(
 		self,
@@ -51,6 +104,20 @@ class PlayerPart(PhysicsBody):
 				self._current_texture = self._texture_left
 			self._render()
 
+	def reseed_walk(self, rng: random.Random) -> None:
+		self._walk_time = rng.uniform(0, math.pi * 2)
+		self._walk_speed = rng.uniform(8, 12)
+		self._walk_amplitude = rng.uniform(2, 4)
+
+	def get_animation_state(self) -> tuple:
+		return (self._facing_right, self._walk_offset_y, self._walk_time)
+
+	def set_animation_state(self, state) -> None:
+		facing_right, walk_offset_y, walk_time = state
+		self._walk_offset_y = float(walk_offset_y)
+		self._walk_time = float(walk_time)
+		self.set_direction(bool(facing_right))
+
 	def update_walk_animation(self, dt: float, is_moving: bool) -> None:
 		if is_moving:
 			self._walk_time += dt * self._walk_speed
@@ -60,15 +127,17 @@ class PlayerPart(PhysicsBody):
 			self._walk_time = 0
 
 	def _render(self) -> None:
+		if self.physics_world.simulation_only:
+			return
 		if self._current_texture is not None:
-			self.image = pygame.transform.scale(self._current_texture, self.size)
+			self.image = assets.get_scaled(self._current_texture, self.size)
 		else:
 			self.image = pygame.Surface(self.size, pygame.SRCALPHA)
 			self.image.fill(self._color)
 
-	def _update_sprite_position(self) -> None:
+	def _update_sprite_position(self, alpha: float = 1.0) -> None:
 		screen_pos = self.physics_world.world_to_screen(
-			(self.body.position.x, self.body.position.y)
+			self.get_interpolated_position(alpha)
 		)
 		adjusted_y = screen_pos[1] + self._walk_offset_y
 		self.rect.center = (screen_pos[0], adjusted_y)
@@ -98,23 +167,55 @@ class CourierBag(PhysicsBody):
 		self._color = color
 		self._max_distance = max_distance
 		self._is_torn = False
+		self.tear_cause = None
 		self.body.fixedRotation = False
 		self.body.bullet = True
 		self._render()
 
 	def _render(self) -> None:
+		if self.physics_world.simulation_only:
+			return
 		if self._texture is not None:
-			self._surface = pygame.transform.scale(self._texture, self.size)
+			self._surface = assets.get_scaled(self._texture, self.size)
 			self.image = self._surface.copy()
 		else:
 			self._surface = pygame.Surface(self.size, pygame.SRCALPHA)
 			self._surface.fill(self._color)
 			self.image = self._surface.copy()
 
+	def get_tear_state(self) -> tuple:
+		return (
+			self._is_torn,
+			getattr(self, '_is_tearing', False),
+			getattr(self, '_tear_scale', 1.0),
+			getattr(self, '_tear_alpha', 255),
+		)
+
+	def set_tear_state(self, state) -> None:
+		"""unlike `reset`, keeps the fixture, a torn bag only loses its joints"""
+
+		is_torn, is_tearing, tear_scale, tear_alpha = state
+		self._is_torn = bool(is_torn)
+		self._is_tearing = bool(is_tearing)
+		self._tear_scale = float(tear_scale)
+		self._tear_alpha = float(tear_alpha)
+		if self.physics_world.simulation_only:
+			return
+		center = self.rect.center
+		self._render()
+		self.rect = self.image.get_rect(center=center)
+
+	def tear(self, cause: str) -> None:
+		"""tears the bag, only the first of several causes in a step is kept"""
+
+		if not self._is_torn:
+			self.tear_cause = cause
+		self._is_torn = True
+
 	def check_tear(self, left_pos: b2Vec2, right_pos: b2Vec2) -> bool:
 		distance = (right_pos - left_pos).length
 		if distance > self._max_distance:
-			self._is_torn = True
+			self.tear('distance')
 			return True
 		return False
 
@@ -130,6 +231,9 @@ class CourierBag(PhysicsBody):
 		self._tear_scale -= 0.15
 		self._tear_alpha -= 25
 
+		if self.physics_world.simulation_only:
+			return self._tear_scale <= 0 or self._tear_alpha <= 0
+
 		if self._tear_scale <= 0 or self._tear_alpha <= 0:
 			self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
 			self.rect = self.image.get_rect(center=self.rect.center)
@@ -141,7 +245,7 @@ class CourierBag(PhysicsBody):
 			return False
 
 		if self._texture is not None:
-			original_image = pygame.transform.scale(self._texture, self.size)
+			original_image = assets.get_scaled(self._texture, self.size)
 		else:
 			original_image = pygame.Surface(self.size, pygame.SRCALPHA)
 			original_image.fill(self._color)
@@ -158,9 +262,11 @@ class CourierBag(PhysicsBody):
 
 	def reset(self) -> None:
 		self._is_torn = False
+		self.tear_cause = None
 		self._is_tearing = False
-		self._render()
-		self.rect = self.image.get_rect()
+		if not self.physics_world.simulation_only:
+			self._render()
+			self.rect = self.image.get_rect()
 		for fixture in self.body.fixtures:
 			self.body.DestroyFixture(fixture)
 		size_meters = (
@@ -239,6 +345,10 @@ class Player(pygame.sprite.Sprite):
 			max_distance=physics_world.pixels_to_meters(size * 2.0)
 		)
 
+		# `_check_ground` reads their contact manifolds from the tracker
+		physics_world.contacts.watch(self._left_part)
+		physics_world.contacts.watch(self._right_part)
+
 		self._left_joint = None
 		self._right_joint = None
 		self._desync_timer = 0
@@ -263,10 +373,14 @@ class Player(pygame.sprite.Sprite):
 		self._explosion_sound_played = False
 		self._is_moving = False
 
-		self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
-		self.rect = self.image.get_rect()
+		if physics_world.simulation_only:
+			self.image = None
+			self.rect = pygame.Rect(0, 0, 1, 1)
+		else:
+			self.image = pygame.Surface((1, 1), pygame.SRCALPHA)
+			self.rect = self.image.get_rect()
 
-	def _create_joints(self) -> None:
+	def _create_joints(self, lengths: tuple[float, float] | None = None) -> None:
 		if self._left_joint is not None:
 			self._physics_world.world.DestroyJoint(self._left_joint)
 		if self._right_joint is not None:
@@ -277,7 +391,10 @@ class Player(pygame.sprite.Sprite):
 		left_joint_def.bodyB = self._bag.body
 		left_joint_def.localAnchorA = b2Vec2(0, 0)
 		left_joint_def.localAnchorB = b2Vec2(0, 0)
-		left_joint_def.length = (self._left_part.body.position - self._bag.body.position).length
+		if lengths is None:
+			left_joint_def.length = (self._left_part.body.position - self._bag.body.position).length
+		else:
+			left_joint_def.length = lengths[0]
 		left_joint_def.collideConnected = True
 		left_joint_def.dampingRatio = 0.5
 		left_joint_def.frequencyHz = 2.0
@@ -288,7 +405,10 @@ class Player(pygame.sprite.Sprite):
 		right_joint_def.bodyB = self._bag.body
 		right_joint_def.localAnchorA = b2Vec2(0, 0)
 		right_joint_def.localAnchorB = b2Vec2(0, 0)
-		right_joint_def.length = (self._right_part.body.position - self._bag.body.position).length
+		if lengths is None:
+			right_joint_def.length = (self._right_part.body.position - self._bag.body.position).length
+		else:
+			right_joint_def.length = lengths[1]
 		right_joint_def.collideConnected = True
 		right_joint_def.dampingRatio = 0.5
 		right_joint_def.frequencyHz = 2.0
@@ -328,18 +448,14 @@ class Player(pygame.sprite.Sprite):
 
 	def _check_ground(self, body, is_left: bool) -> bool:
 		ground_contacts = 0
-		for contact_edge in body.contacts:
-			contact = contact_edge.contact
-			if not contact.touching:
-				continue
-			world_manifold = contact.worldManifold
+		for world_manifold in self._physics_world.contacts.manifolds(body):
 			if len(world_manifold.points) < 1:
 				continue
 			if world_manifold.normal[1] > 0.5:
 				ground_contacts += 1
 			if len(world_manifold.points) >= 2:
 				contact_center_x = sum(p[0] for p in world_manifold.points) / len(world_manifold.points)
-				body_center_x = body.position.x
+				body_center_x = body.body.position.x
 				x_diff = abs(contact_center_x - body_center_x)
 				body_half_width = self._physics_world.pixels_to_meters(self._size * 0.4) / 2
 				if x_diff < body_half_width * 0.8:
@@ -444,9 +560,9 @@ class Player(pygame.sprite.Sprite):
 
 		self._explosion_applied = True
 
-	def force_tear(self) -> None:
+	def force_tear(self, cause: str = 'death_zone') -> None:
 		if not self._bag.is_torn and not self._is_finished:
-			self._bag._is_torn = True
+			self._bag.tear(cause)
 
 	def set_finished(self) -> None:
 		self._is_finished = True
@@ -489,12 +605,15 @@ class Player(pygame.sprite.Sprite):
 	def is_game_over(self) -> bool:
 		return self._bag.is_torn
 
+	def get_tear_cause(self) -> str | None:
+		return self._bag.tear_cause
+
 	def is_finished(self) -> bool:
 		return self._is_finished
 
-	def get_bag_screen_position(self) -> tuple[float, float]:
+	def get_bag_screen_position(self, alpha: float = 1.0) -> tuple[float, float]:
 		return self._physics_world.world_to_screen(
-			(self._bag.body.position.x, self._bag.body.position.y)
+			self._bag.get_interpolated_position(alpha)
 		)
 
 	def get_bag_size(self) -> tuple[int, int]:
@@ -508,6 +627,75 @@ class Player(pygame.sprite.Sprite):
 		right_vel = self._right_part.body.linearVelocity
 		return ((left_vel.x, left_vel.y), (right_vel.x, right_vel.y))
 
+	def get_parts_screen_positions(self) -> tuple[tuple[float, float], tuple[float, float]]:
+		world_to_screen = self._physics_world.world_to_screen
+		left_pos = self._left_part.body.position
+		right_pos = self._right_part.body.position
+		return (world_to_screen((left_pos.x, left_pos.y)), world_to_screen((right_pos.x, right_pos.y)))
+
+	def get_speed(self) -> float:
+		return self._speed
+
+	def get_part_size(self) -> tuple[int, int]:
+		return self._left_part.size
+
+	def is_on_ground(self) -> tuple[bool, bool]:
+		"""ground contact of the left and right part as of the last update, False while spawn locked"""
+
+		return (self._left_on_ground, self._right_on_ground)
+
+	def reseed(self, seed: int) -> None:
+		"""re-rolls the walk animation parameters, which are random per part"""
+
+		rng = random.Random(seed)
+		self._left_part.reseed_walk(rng)
+		self._right_part.reseed_walk(rng)
+
+	def set_spawn(self, position: tuple[int | float, int | float]) -> None:
+		self._initial_position = position
+
+	def snapshot(self) -> np.ndarray:
+		"""captures everything but the bodies as a `PLAYER_STATE_DTYPE` record"""
+
+		state = np.zeros((), dtype=PLAYER_STATE_DTYPE)
+		state['initial_position'] = self._initial_position
+		for name in PLAYER_STATE_FIELDS:
+			state[name] = getattr(self, '_' + name)
+		state['left_keys'] = (self._left_keys['left'], self._left_keys['jump'])
+		state['right_keys'] = (self._right_keys['right'], self._right_keys['jump'])
+		state['left_part'] = self._left_part.get_animation_state()
+		state['right_part'] = self._right_part.get_animation_state()
+		state['bag'] = self._bag.get_tear_state()
+		if self._bag.tear_cause is not None:
+			state['tear_cause'] = TEAR_CAUSES.index(self._bag.tear_cause) + 1
+		if self._left_joint is None:
+			state['joint_lengths'] = np.nan
+		else:
+			state['joint_lengths'] = (self._left_joint.length, self._right_joint.length)
+		return state
+
+	def restore(self, snapshot: np.ndarray) -> None:
+		"""puts a `snapshot` back in place, joints are only recreated if the bag was torn since"""
+
+		self._initial_position = tuple(snapshot['initial_position'].tolist())
+		for name in PLAYER_STATE_FIELDS:
+			setattr(self, '_' + name, snapshot[name].item())
+		left_move, left_jump = snapshot['left_keys'].tolist()
+		right_move, right_jump = snapshot['right_keys'].tolist()
+		self._left_keys = {'left': left_move, 'jump': left_jump}
+		self._right_keys = {'right': right_move, 'jump': right_jump}
+		self._left_part.set_animation_state(snapshot['left_part'])
+		self._right_part.set_animation_state(snapshot['right_part'])
+		self._bag.set_tear_state(snapshot['bag'])
+		tear_cause = int(snapshot['tear_cause'])
+		self._bag.tear_cause = TEAR_CAUSES[tear_cause - 1] if tear_cause else None
+
+		joint_lengths = snapshot['joint_lengths'].tolist()
+		if np.isnan(joint_lengths[0]):
+			self._destroy_joints()
+		elif self._left_joint is None:
+			self._create_joints(joint_lengths)
+
 	def respawn(self) -> None:
 		part_width = int(self._size * 0.4)
 		bag_size = int(self._size * 0.65)
@@ -554,9 +742,10 @@ class Player(pygame.sprite.Sprite):
 		self._bag.body.linearVelocity = b2Vec2(0, 0)
 		self._bag.body.angularVelocity = 0
 
-		self._left_part._update_sprite_position()
-		self._right_part._update_sprite_position()
-		self._bag._update_sprite_position()
+		for part in (self._left_part, self._right_part, self._bag):
+			part.store_previous_transform()
+			if not self._physics_world.simulation_only:
+				part._update_sprite_position()
 
 		self._create_joints()
 		self._spawn_locked = True
@@ -572,7 +761,7 @@ class Player(pygame.sprite.Sprite):
 		self._explosion_sound_played = False
 		self._is_moving = False
 
-	def update(self, current_time: float) -> None:
+	def update(self, current_time: float, dt: float = 1.0 / 60.0) -> None:
 		self._update_spawn_lock()
 
 		if self._bag.is_torn and not self._bag_tear_animation_done:
@@ -584,8 +773,8 @@ class Player(pygame.sprite.Sprite):
 				self._bag_tear_animation_done = True
 
 		if not self._spawn_locked and not self._bag.is_torn and not self._explosion_applied and not self._is_finished:
-			left_on_ground = self._check_ground(self._left_part.body, True)
-			right_on_ground = self._check_ground(self._right_part.body, False)
+			left_on_ground = self._check_ground(self._left_part, True)
+			right_on_ground = self._check_ground(self._right_part, False)
 
 			if left_on_ground and not self._left_on_ground:
 				self._left_jumps = self._max_jumps
@@ -608,7 +797,7 @@ class Player(pygame.sprite.Sprite):
 			right_wants_move = self._right_keys['right']
 
 			if left_wants_move and right_wants_move:
-				self._bag._is_torn = True
+				self._bag.tear('both_keys')
 				if self._sound_manager:
 					self._sound_manager.play_sound('rope_stretch') 
 				self._stop_left_part()
@@ -628,12 +817,11 @@ class Player(pygame.sprite.Sprite):
 				self._right_keys['jump'] = False
 
 			if self._check_desync():
-				self._bag._is_torn = True
+				self._bag.tear('desync')
 
 			self._check_rope_stretch(current_time)
 			self._bag.check_tear(self._left_part.body.position, self._right_part.body.position)
 
-		dt = 1.0 / 60.0
 		self._left_part.update_walk_animation(dt, self._is_moving and self._left_on_ground)
 		self._right_part.update_walk_animation(dt, self._is_moving and self._right_on_ground)
 
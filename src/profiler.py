@@ -0,0 +1,193 @@
+import csv
+import json
+import time
+from collections import deque
+
+import numpy as np
+import pygame
+
+from .fonts import text_cache
+
+
+class _Scope:
+	__slots__ = ('_profiler', '_name', '_start')
+
+	def __init__(self, profiler: 'FrameProfiler', name: str) -> None:
+		self._profiler = profiler
+		self._name = name
+
+	def __enter__(self) -> None:
+		self._start = time.perf_counter()
+
+	def __exit__(self, *exc_info) -> None:
+		self._profiler.add(self._name, self._start, time.perf_counter() - self._start)
+
+
+class _NullScope:
+	__slots__ = ()
+
+	def __enter__(self) -> None:
+		pass
+
+	def __exit__(self, *exc_info) -> None:
+		pass
+
+
+_NULL_SCOPE = _NullScope()
+
+
+class FrameProfiler:
+	"""named scoped timers with a ring buffer of per-frame totals.
+
+	Scopes may nest, each one is accumulated under its own name. Raw scope
+	events are kept as well, so a window of history can be exported as a
+	Chrome trace
+	"""
+
+	def __init__(self, history: int = 240, enabled: bool = False, max_events: int = 16384) -> None:
+		self.enabled = enabled
+		self._history = history
+		self._phases = {}
+		self._frame_times = np.zeros(history)
+		self._current = {}
+		self._events = deque(maxlen=max_events)
+		self._frame_index = 0
+		self._frame_count = 0
+		self._last_frame_end = None
+		self._origin = time.perf_counter()
+
+	def scope(self, name: str) -> _Scope | _NullScope:
+		if not self.enabled:
+			return _NULL_SCOPE
+		return _Scope(self, name)
+
+	def add(self, name: str, start: float, duration: float) -> None:
+		self._current[name] = self._current.get(name, 0.0) + duration
+		self._events.append((self._frame_count, name, start, duration))
+
+	def end_frame(self) -> None:
+		now = time.perf_counter()
+		if not self.enabled:
+			self._last_frame_end = now
+			return
+
+		index = self._frame_index
+		frame_time = 0.0 if self._last_frame_end is None else now - self._last_frame_end
+		self._frame_times[index] = frame_time
+		self._last_frame_end = now
+
+		for name in self._current:
+			if name not in self._phases:
+				self._phases[name] = np.zeros(self._history)
+		for name, history in self._phases.items():
+			history[index] = self._current.get(name, 0.0)
+
+		self._current.clear()
+		self._frame_index = (index + 1) % self._history
+		self._frame_count += 1
+
+	def reset(self) -> None:
+		self._phases.clear()
+		self._frame_times[:] = 0.0
+		self._current.clear()
+		self._events.clear()
+		self._frame_index = 0
+		self._frame_count = 0
+		self._last_frame_end = None
+
+	@property
+	def phase_names(self) -> list[str]:
+		return list(self._phases)
+
+	def _ordered(self, history: np.ndarray) -> np.ndarray:
+		"""returns ring buffer contents from the oldest to the newest frame"""
+
+		count = min(self._frame_count, self._history)
+		if self._frame_count <= self._history:
+			return history[:count].copy()
+		return np.roll(history, -self._frame_index)
+
+	def get_frame_times(self) -> np.ndarray:
+		return self._ordered(self._frame_times)
+
+	def get_history(self, name: str) -> np.ndarray:
+		if name not in self._phases:
+			return np.zeros(min(self._frame_count, self._history))
+		return self._ordered(self._phases[name])
+
+	def last_frame(self) -> dict[str, float]:
+		if self._frame_count == 0:
+			return {}
+		index = (self._frame_index - 1) % self._history
+		return {name: float(history[index]) for name, history in self._phases.items()}
+
+	def dump_csv(self, path: str) -> None:
+		names = self.phase_names
+		frame_times = self.get_frame_times()
+		phases = [self.get_history(name) for name in names]
+		first_frame = self._frame_count - len(frame_times)
+
+		with open(path, 'w', newline='') as file:
+			writer = csv.writer(file)
+			writer.writerow(['frame', 'frame_ms', *(f'{name}_ms' for name in names)])
+			for row, frame_time in enumerate(frame_times):
+				writer.writerow([
+					first_frame + row,
+					f'{frame_time * 1000.0:.4f}',
+					*(f'{phase[row] * 1000.0:.4f}' for phase in phases),
+				])
+
+	def dump_chrome_trace(self, path: str) -> None:
+		events = [
+			{
+				'name': name,
+				'cat': 'frame',
+				'ph': 'X',
+				'ts': (start - self._origin) * 1e6,
+				'dur': duration * 1e6,
+				'pid': 0,
+				'tid': 0,
+				'args': {'frame': frame},
+			}
+			for frame, name, start, duration in self._events
+		]
+
+		with open(path, 'w') as file:
+			json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+
+	def draw(
+		self,
+		surface: pygame.Surface,
+		pos: tuple[int, int] = (4, 28),
+		size: tuple[int, int] = (320, 80),
+		budget_ms: float = 1000.0 / 60.0,
+	) -> None:
+		"""draws a frame-time graph and a bar per phase of the last frame"""
+
+		x, y = pos
+		width, height = size
+		scale = height / (budget_ms * 2.0)
+
+		pygame.draw.rect(surface, (0, 0, 0, 160), (x, y, width, height))
+		budget_y = y + height - budget_ms * scale
+		pygame.draw.line(surface, '#606060', (x, budget_y), (x + width, budget_y))
+
+		frame_times = self.get_frame_times()[-width:] * 1000.0
+		if len(frame_times) >= 2:
+			points = [
+				(x + width - len(frame_times) + i, y + height - min(height, frame_time * scale))
+				for i, frame_time in enumerate(frame_times)
+			]
+			pygame.draw.lines(surface, '#f5d355', False, points)
+
+		bar_y = y + height + 4
+		for name, duration in sorted(self.last_frame().items(), key=lambda item: -item[1]):
+			duration_ms = duration * 1000.0
+			bar_width = min(width, int(duration_ms / budget_ms * width))
+			pygame.draw.rect(surface, '#4ECDC4', (x, bar_y, bar_width, 12))
+			label = text_cache.get_font(12).render(f'{name} {duration_ms:.2f}', True, '#f2f2f2')
+			surface.blit(label, (x + 2, bar_y - 1))
+			bar_y += 14
+
+	def get_overlay_size(self, size: tuple[int, int] = (320, 80)) -> tuple[int, int]:
+		return (size[0], size[1] + 4 + 14 * len(self._phases))
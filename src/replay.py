@@ -0,0 +1,212 @@
+"""deterministic input recording and headless replay.
+
+Usage: python -m src.replay REPLAY.json [--repeat N] [--json PATH]
+
+A recording is started with `Game.start_recording` (F6 in game), which
+restarts the level, reseeds every random source and then logs each key
+event with the simulation step it was applied before. Replaying builds the
+same level at the same size in a simulation-only game, which needs no
+display, feeds the events back step by step without frame limiting and
+compares the final simulation digest with the recorded one
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+import pygame
+
+
+REPLAY_VERSION = 1
+
+# profiler, rewind and recording keys, they change nothing a replay could reproduce
+META_KEYS = frozenset((pygame.K_F3, pygame.K_F4, pygame.K_F5, pygame.K_F6))
+
+
+def simulation_digest(game) -> str:
+	"""hashes the dynamic bodies, the player and the round outcome"""
+
+	digest = hashlib.sha1()
+	digest.update(game.physics_world.snapshot().tobytes())
+	digest.update(game._player.snapshot().tobytes())
+	digest.update(np.array([game._is_game_over, game._is_victory]).tobytes())
+	return digest.hexdigest()
+
+
+class InputLog:
+	"""key events of one recorded run, keyed by simulation step.
+
+	Steps are counted from the start of the recording. `steps` and `digest`
+	are filled in by `finish` when the recording stops
+	"""
+
+	def __init__(
+		self,
+		seed: int,
+		level_path: str | None,
+		size: tuple[int, int],
+		physics_hz: int = 60,
+		streaming: bool = False,
+		start_step: int = 0,
+		events: list | None = None,
+		steps: int = 0,
+		digest: str | None = None,
+	) -> None:
+		self.seed = seed
+		self.level_path = level_path
+		self.size = tuple(size)
+		self.physics_hz = physics_hz
+		self.streaming = streaming
+		self.start_step = start_step
+		self.events = events if events is not None else []
+		self.steps = steps
+		self.digest = digest
+
+	def __len__(self) -> int:
+		return len(self.events)
+
+	def add(self, step: int, key: int, unicode: str, state: bool) -> None:
+		self.events.append((step - self.start_step, key, unicode, state))
+
+	def finish(self, step: int, digest: str) -> None:
+		self.steps = step - self.start_step
+		self.digest = digest
+
+	def events_by_step(self) -> dict[int, list[tuple[int, str, bool]]]:
+		"""gameplay events grouped by step, meta keys logged by older recordings are dropped"""
+
+		by_step = {}
+		for step, key, unicode, state in self.events:
+			if key in META_KEYS:
+				continue
+			by_step.setdefault(step, []).append((key, unicode, state))
+		return by_step
+
+	def to_dict(self) -> dict:
+		return {
+			'version': REPLAY_VERSION,
+			'seed': self.seed,
+			'level': self.level_path,
+			'size': list(self.size),
+			'physics_hz': self.physics_hz,
+			'streaming': self.streaming,
+			'steps': self.steps,
+			'digest': self.digest,
+			'events': [list(event) for event in self.events],
+		}
+
+	@classmethod
+	def from_dict(cls, data: dict) -> 'InputLog':
+		if data.get('version') != REPLAY_VERSION:
+			raise ValueError(f'Unsupported replay version: {data.get("version")}')
+
+		return cls(
+			seed=data['seed'],
+			level_path=data['level'],
+			size=data['size'],
+			physics_hz=data['physics_hz'],
+			streaming=data['streaming'],
+			events=[tuple(event) for event in data['events']],
+			steps=data['steps'],
+			digest=data['digest'],
+		)
+
+	def save(self, path: str) -> None:
+		with open(path, 'w', encoding='utf-8') as file:
+			json.dump(self.to_dict(), file)
+
+	@classmethod
+	def load(cls, path: str) -> 'InputLog':
+		with open(path, encoding='utf-8') as file:
+			return cls.from_dict(json.load(file))
+
+
+def build_replay_game(log: InputLog):
+	"""builds the recorded level in a simulation-only `Game`, seeded like the recording"""
+
+	from main import create_game
+	from src.game import Game
+
+	random.seed(log.seed)
+	game = create_game(
+		None,
+		level_path=log.level_path,
+		size=log.size,
+		game_class=Game,
+		streaming=log.streaming,
+		physics_hz=log.physics_hz,
+		simulation_only=True,
+	)
+	game.reseed(log.seed)
+	return game
+
+
+def replay(log: InputLog, game=None):
+	"""runs `log` to its last step as fast as the physics allows and returns the game"""
+
+	if game is None:
+		game = build_replay_game(log)
+
+	events = log.events_by_step()
+	for step in range(log.steps):
+		for key, unicode, state in events.get(step, ()):
+			event_type = pygame.KEYDOWN if state else pygame.KEYUP
+			game._handle_key(pygame.event.Event(event_type, key=key, unicode=unicode), state)
+		game.step()
+
+	return game
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description='Headless replay of a recorded run')
+	parser.add_argument('replay')
+	parser.add_argument('--repeat', type=int, default=1, help='replay N times and report the throughput')
+	parser.add_argument('--json', help='write the result to this path')
+	args = parser.parse_args()
+
+	os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+	os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+	log = InputLog.load(args.replay)
+	timings = []
+	digests = set()
+	for _ in range(args.repeat):
+		game = build_replay_game(log)
+		start = time.perf_counter()
+		replay(log, game)
+		timings.append(time.perf_counter() - start)
+		digests.add(simulation_digest(game))
+
+	best = min(timings)
+	result = {
+		'steps': log.steps,
+		'events': len(log),
+		'best_seconds': best,
+		'steps_per_second': log.steps / best if best > 0 else float('inf'),
+		'realtime_factor': log.steps / log.physics_hz / best if best > 0 else float('inf'),
+		'deterministic': len(digests) == 1,
+		'matches_recording': digests == {log.digest},
+	}
+
+	print(
+		f'{log.steps} steps, {len(log)} events: {result["steps_per_second"]:.0f} steps/s '
+		f'({result["realtime_factor"]:.1f}x realtime)'
+	)
+	print('digest matches recording' if result['matches_recording'] else 'digest MISMATCH')
+
+	if args.json:
+		with open(args.json, 'w') as file:
+			json.dump(result, file, indent='\t')
+
+	pygame.quit()
+	if not result['matches_recording']:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main()
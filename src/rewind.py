@@ -0,0 +1,118 @@
+import numpy as np
+
+from .physic import BODY_STATE_DTYPE
+from .player import PLAYER_STATE_DTYPE
+
+
+class RewindBuffer:
+	"""ring buffer of the last `seconds` of simulation steps of a `Game`.
+
+	Every step stores the dynamic bodies, the player and the round flags as
+	rows of preallocated record arrays, so memory is fixed by the window
+	length. Particles only change by `ParticleSystem.update` between emits,
+	so they are stored as keyframes, taken every `keyframe_interval` steps and
+	on every emit, and replayed forward from the closest one on `rewind`
+	"""
+
+	def __init__(self, game, seconds: float = 10.0, keyframe_interval: int = 30) -> None:
+		self._game = game
+		self.capacity = max(1, round(seconds / game._fixed_dt))
+		self._keyframe_interval = max(1, keyframe_interval)
+		self._bodies = ()
+		self._body_states = np.zeros((self.capacity, 0), dtype=BODY_STATE_DTYPE)
+		self._player_states = np.zeros(self.capacity, dtype=PLAYER_STATE_DTYPE)
+		self._round_states = np.zeros(self.capacity, dtype=game.get_round_state().dtype)
+		self._keyframe_of = np.zeros(self.capacity, dtype=np.int64)
+		self._keyframes = {}
+		self._last_keyframe = None
+		self._emitted = None
+		self._start = 0
+		self._end = 0
+
+	def __len__(self) -> int:
+		return self._end - self._start
+
+	@property
+	def nbytes(self) -> int:
+		return (
+			self._body_states.nbytes + self._player_states.nbytes
+			+ self._round_states.nbytes + self._keyframe_of.nbytes
+		)
+
+	def clear(self) -> None:
+		self._keyframes.clear()
+		self._last_keyframe = None
+		self._emitted = None
+		self._start = self._end = 0
+
+	def _particle_systems(self) -> tuple:
+		return (self._game._debris_particles, self._game._confetti_particles)
+
+	def record(self) -> None:
+		"""stores the current step, overwriting the oldest one once the buffer is full"""
+
+		game = self._game
+		bodies = game.physics_world.dynamic_bodies
+		if bodies is not self._bodies:
+			# a body was added or removed, older steps no longer line up
+			self.clear()
+			self._bodies = bodies
+			self._body_states = np.zeros((self.capacity, len(bodies)), dtype=BODY_STATE_DTYPE)
+
+		frame = self._end
+		slot = frame % self.capacity
+		game.physics_world.snapshot(self._body_states[slot])
+		self._player_states[slot] = game._player.snapshot()
+		self._round_states[slot] = game.get_round_state()
+
+		systems = self._particle_systems()
+		emitted = tuple(system.emitted for system in systems)
+		if (self._last_keyframe is None or emitted != self._emitted
+			or frame - self._last_keyframe >= self._keyframe_interval):
+			self._keyframes[frame] = tuple(system.snapshot() for system in systems)
+			self._last_keyframe = frame
+			self._emitted = emitted
+		self._keyframe_of[slot] = self._last_keyframe
+
+		self._end = frame + 1
+		if self._end - self._start > self.capacity:
+			self._start = self._end - self.capacity
+			oldest_keyframe = self._keyframe_of[self._start % self.capacity]
+			for keyframe in [keyframe for keyframe in self._keyframes if keyframe < oldest_keyframe]:
+				del self._keyframes[keyframe]
+
+	def rewind(self, steps: int) -> int:
+		"""restores the state from `steps` steps ago, clamped to the window.
+
+		Later steps are dropped, recording continues from the restored one.
+		Returns how many steps were actually rewound
+		"""
+
+		if not len(self):
+			return 0
+
+		steps = max(0, min(steps, len(self) - 1))
+		frame = self._end - 1 - steps
+		slot = frame % self.capacity
+
+		self._game.restore({
+			'round': self._round_states[slot],
+			'bodies': self._body_states[slot],
+			'player': self._player_states[slot],
+			'debris': None,
+			'confetti': None,
+			'snow': None,
+		})
+
+		keyframe = int(self._keyframe_of[slot])
+		for system, snapshot in zip(self._particle_systems(), self._keyframes[keyframe], strict=True):
+			system.restore(snapshot)
+			for _ in range(frame - keyframe):
+				system.update()
+
+		for later in [later for later in self._keyframes if later > frame]:
+			del self._keyframes[later]
+		self._end = frame + 1
+		self._last_keyframe = keyframe
+		self._emitted = tuple(system.emitted for system in self._particle_systems())
+		return steps
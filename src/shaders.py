@@ -1,9 +1,345 @@
 from array import array
+from collections import OrderedDict
 from collections.abc import Callable
+import math
 
+import numpy as np
 import pygame
 import moderngl
 
+from .fonts import text_cache
+from .profiler import FrameProfiler
+
+
+def surface_bytes(surf: pygame.Surface):
+	if surf.get_bytesize() == 4 and surf.get_pitch() == surf.get_width() * 4:
+		return surf.get_view('1')
+	return pygame.image.tobytes(surf, 'BGRA')
+
+
+# 'pbo' streams frames through two pixel buffers: the texture is filled from the one
+# written by the previous upload while this one is staged, so it lags one frame behind
+UPLOAD_MODES = ('direct', 'pbo')
+
+
+def derive_render_scale(resolution_scale: float, screen_height: int) -> float:
+	"""one target pixel per PS1 block, using the block height of the pixelation pass"""
+
+	return 1.0 / max(1, math.floor(resolution_scale * screen_height))
+
+
+def is_headless() -> bool:
+	return pygame.display.get_init() and pygame.display.get_driver() == 'dummy'
+
+
+def create_headless_context() -> moderngl.Context:
+	try:
+		return moderngl.create_standalone_context()
+	except Exception:
+		return moderngl.create_standalone_context(backend='egl')
+
+
+def surface_rgba_bytes(surf: pygame.Surface):
+	"""like `surface_bytes`, but surfaces without per-pixel alpha come out opaque"""
+
+	if surf.get_flags() & pygame.SRCALPHA:
+		return surface_bytes(surf)
+	return pygame.image.tobytes(surf, 'BGRA')
+
+
+SPRITE_INSTANCE_DTYPE = np.dtype([
+	('center', np.float32, 2),
+	('size', np.float32, 2),
+	('angle', np.float32),
+	('uv', np.float32, 4),
+	('tint', np.float32, 4),
+])
+
+
+class SpriteAtlas:
+	"""one large texture that sprite surfaces are packed into on first use.
+
+	Rows are packed on shelves. When the atlas is full it is cleared and
+	refilled by the following lookups, so surfaces that are no longer drawn
+	drop out on their own. A white block is reserved for untextured quads
+	"""
+
+	def __init__(self, ctx: moderngl.Context, size: int = 2048, padding: int = 1) -> None:
+		self.ctx = ctx
+		self.size = size
+		self._padding = padding
+		self.texture = ctx.texture((size, size), 4)
+		self.texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+		self.texture.swizzle = 'BGRA'
+		self._entries = {}
+		self.clear()
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def clear(self) -> None:
+		self._entries.clear()
+		self._shelf_x = 0
+		self._shelf_y = 0
+		self._shelf_height = 0
+		self.white_uv = self._pack(b'\xff' * 4 * 4, 2, 2)
+		self._reserved_height = self._shelf_height
+		# sample the middle of the white block so filtering never reaches its border
+		u0, v0, u1, v1 = self.white_uv
+		self.white_uv = ((u0 + u1) / 2, (v0 + v1) / 2, (u0 + u1) / 2, (v0 + v1) / 2)
+
+	def _pack(self, data, width: int, height: int) -> tuple[float, float, float, float] | None:
+		padding = self._padding
+		if self._shelf_x + width + padding > self.size:
+			self._shelf_x = 0
+			self._shelf_y += self._shelf_height
+			self._shelf_height = 0
+
+		if width + padding > self.size or self._shelf_y + height + padding > self.size:
+			return None
+
+		x, y = self._shelf_x, self._shelf_y
+		self.texture.write(data, viewport=(x, y, width, height))
+		self._shelf_x += width + padding
+		self._shelf_height = max(self._shelf_height, height + padding)
+
+		size = self.size
+		return (x / size, y / size, (x + width) / size, (y + height) / size)
+
+	def can_hold(self, surf: pygame.Surface) -> bool:
+		"""whether `surf` fits an empty atlas next to the white block"""
+
+		width, height = surf.get_size()
+		return width + self._padding <= self.size and height + self._padding <= self.size - self._reserved_height
+
+	def get(self, surf: pygame.Surface) -> tuple[float, float, float, float] | None:
+		"""returns the uv rect of `surf`, or None if it does not fit"""
+
+		key = id(surf)
+		entry = self._entries.get(key)
+		if entry is not None and entry[0] is surf:
+			return entry[1]
+
+		width, height = surf.get_size()
+		uv = self._pack(surface_rgba_bytes(surf), width, height)
+		if uv is not None:
+			self._entries[key] = (surf, uv)
+		return uv
+
+	def release(self) -> None:
+		self._entries.clear()
+		self.texture.release()
+
+
+class SpriteBatch:
+	"""collects sprites and solid quads, then draws them in one instanced call.
+
+	Surfaces are resolved against a `SpriteAtlas` when the batch is drawn,
+	those that don't fit get a texture of their own and split the draw call
+	where they appear. Positions are in screen pixels with y pointing down, angles are in degrees
+	counterclockwise like `pygame.transform.rotate`
+	"""
+
+	def __init__(self, ctx: moderngl.Context, quad_buffer: moderngl.Buffer, atlas_size: int = 2048) -> None:
+		self.ctx = ctx
+		self.atlas = SpriteAtlas(ctx, atlas_size)
+
+		self.program = ctx.program(
+			vertex_shader='''
+			#version 330 core
+
+			uniform vec2 screen;
+
+			in vec2 corner;
+			in vec2 center;
+			in vec2 size;
+			in float angle;
+			in vec4 uv_rect;
+			in vec4 tint;
+
+			out vec2 uvs;
+			out vec4 color;
+
+			void main() {
+				vec2 local = (corner - 0.5) * size;
+				float c = cos(angle);
+				float s = sin(angle);
+				vec2 pos = center + vec2(local.x * c + local.y * s, local.y * c - local.x * s);
+
+				uvs = mix(uv_rect.xy, uv_rect.zw, corner);
+				color = tint;
+				gl_Position = vec4(pos.x / screen.x * 2.0 - 1.0, 1.0 - pos.y / screen.y * 2.0, 0.0, 1.0);
+			}
+			''',
+			fragment_shader='''
+			#version 330 core
+
+			uniform sampler2D atlas;
+
+			in vec2 uvs;
+			in vec4 color;
+			out vec4 f_color;
+
+			void main() {
+				f_color = texture(atlas, uvs) * color;
+			}
+			'''
+		)
+
+		self.instance_buffer = ctx.buffer(reserve=SPRITE_INSTANCE_DTYPE.itemsize * 1024, dynamic=True)
+		self.vertex_array = ctx.vertex_array(
+			self.program,
+			[
+				(quad_buffer, '8x 2f', 'corner'),
+				(self.instance_buffer, '2f 2f 1f 4f 4f/i', 'center', 'size', 'angle', 'uv_rect', 'tint'),
+			]
+		)
+
+		self._runs = []
+		# id -> (surface, texture) for surfaces the atlas could not take
+		self._textures = {}
+		self.instance_count = 0
+		self.draw_calls = 0
+
+	def begin(self) -> None:
+		self._runs.clear()
+
+	def add_surface(self, surf: pygame.Surface, pos: tuple[int | float, int | float]) -> None:
+		"""queues `surf` with its top-left corner at `pos`, honouring its surface alpha"""
+
+		if self._runs and isinstance(self._runs[-1], list):
+			self._runs[-1].append((surf, pos))
+		else:
+			self._runs.append([(surf, pos)])
+
+	def add_quads(
+		self,
+		centers: np.ndarray,
+		sizes: np.ndarray,
+		angles: np.ndarray,
+		colors: np.ndarray,
+	) -> None:
+		"""queues untextured quads, `colors` are RGBA rows in the 0-1 range"""
+
+		if len(centers) == 0:
+			return
+
+		block = np.empty(len(centers), dtype=SPRITE_INSTANCE_DTYPE)
+		block['center'] = centers
+		block['size'] = sizes
+		block['angle'] = np.radians(angles)
+		block['tint'] = colors
+		self._runs.append(block)
+
+	def _resolve(self, surfaces: dict[int, pygame.Surface]) -> dict[int, tuple[float, float, float, float]]:
+		"""uv rects of the `surfaces` the atlas can take, the others are left out"""
+
+		uvs = {}
+		for key, surf in surfaces.items():
+			# surfaces larger than the atlas would clear it every frame for nothing
+			if self.atlas.can_hold(surf):
+				uv = self.atlas.get(surf)
+				if uv is not None:
+					uvs[key] = uv
+		return uvs
+
+	def _surface_texture(self, surf: pygame.Surface) -> moderngl.Texture:
+		key = id(surf)
+		entry = self._textures.get(key)
+		if entry is None or entry[0] is not surf:
+			if entry is not None:
+				entry[1].release()
+			texture = self.ctx.texture(surf.get_size(), 4, surface_rgba_bytes(surf))
+			texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+			texture.swizzle = 'BGRA'
+			entry = self._textures[key] = (surf, texture)
+		return entry[1]
+
+	def _build(self) -> tuple[np.ndarray, list[list]]:
+		"""instance rows in draw order and the [texture, count] runs they are drawn in"""
+
+		surfaces = {id(surf): surf for run in self._runs if isinstance(run, list) for surf, _ in run}
+		uvs = self._resolve(surfaces)
+		missing = sum(self.atlas.can_hold(surf) for surf in surfaces.values()) - len(uvs)
+		if missing and len(self.atlas) > len(uvs):
+			# the atlas ran full with surfaces of earlier frames, start over with only what this frame needs
+			self.atlas.clear()
+			uvs = self._resolve(surfaces)
+
+		textures = {key: self._surface_texture(surf) for key, surf in surfaces.items() if key not in uvs}
+		for key in [key for key in self._textures if key not in textures]:
+			self._textures.pop(key)[1].release()
+
+		parts = []
+		segments = []
+
+		def extend(texture: moderngl.Texture, count: int) -> None:
+			if segments and segments[-1][0] is texture:
+				segments[-1][1] += count
+			else:
+				segments.append([texture, count])
+
+		for run in self._runs:
+			if not isinstance(run, list):
+				run['uv'] = self.atlas.white_uv
+				parts.append(run)
+				extend(self.atlas.texture, len(run))
+				continue
+
+			rows = np.empty(len(run), dtype=SPRITE_INSTANCE_DTYPE)
+			for index, (surf, (x, y)) in enumerate(run):
+				width, height = surf.get_size()
+				alpha = surf.get_alpha()
+				key = id(surf)
+				rows[index] = (
+					(x + width / 2, y + height / 2),
+					(width, height),
+					0.0,
+					uvs.get(key, (0.0, 0.0, 1.0, 1.0)),
+					(1.0, 1.0, 1.0, 1.0 if alpha is None else alpha / 255),
+				)
+				extend(textures.get(key, self.atlas.texture), 1)
+			parts.append(rows)
+
+		if not parts:
+			return np.empty(0, dtype=SPRITE_INSTANCE_DTYPE), segments
+		return np.concatenate(parts), segments
+
+	def draw(self, fbo: moderngl.Framebuffer, screen: tuple[int, int]) -> None:
+		instances, segments = self._build()
+		self.instance_count = len(instances)
+		self.draw_calls = len(segments)
+		if self.instance_count == 0:
+			return
+
+		self.program['atlas'] = 0
+		self.program['screen'] = screen
+
+		fbo.use()
+		self.ctx.enable(moderngl.BLEND)
+		start = 0
+		for texture, count in segments:
+			data = instances[start:start + count].tobytes()
+			if self.instance_buffer.size < len(data):
+				self.instance_buffer.orphan(len(data))
+			elif start:
+				# the previous run may still be reading the buffer
+				self.instance_buffer.orphan()
+			self.instance_buffer.write(data)
+			texture.use(0)
+			self.vertex_array.render(mode=moderngl.TRIANGLE_STRIP, instances=count)
+			start += count
+		self.ctx.disable(moderngl.BLEND)
+
+	def release(self) -> None:
+		self.vertex_array.release()
+		self.instance_buffer.release()
+		self.program.release()
+		self.atlas.release()
+		for _, texture in self._textures.values():
+			texture.release()
+		self._textures.clear()
+
 
 class PS1ShaderEffect:
 	def __init__(
@@ -13,14 +349,27 @@ class PS1ShaderEffect:
 		jitter_strength: float = 1.0,
 		fog_density: float = 0.3,
 		fog_color: tuple[float, float, float] = (0.35, 0.35, 0.43),
+		upload_mode: str = 'pbo',
+		ctx: moderngl.Context | None = None,
+		profiler: FrameProfiler | None = None,
+		low_res: bool = False,
+		render_scale: float | None = None,
 	) -> None:
+		if upload_mode not in UPLOAD_MODES:
+			raise ValueError(f'Unknown upload mode: {upload_mode}')
+
 		self.screen_size = screen_size
 		self.resolution_scale = resolution_scale
 		self.jitter_strength = jitter_strength
 		self.fog_density = fog_density
 		self.fog_color = fog_color
+		self.upload_mode = upload_mode
+		self.low_res = low_res
+		self.render_scale = render_scale
+		self.render_size = tuple(screen_size)
+		self.profiler = profiler if profiler is not None else FrameProfiler()
 
-		self.ctx = moderngl.create_context()
+		self.ctx = ctx if ctx is not None else moderngl.create_context()
 
 		self.quad_buffer = self.ctx.buffer(data=array('f', [
 			-1.0, 1.0, 0.0, 0.0,
@@ -51,6 +400,7 @@ class PS1ShaderEffect:
 		uniform float fog_density;
 		uniform vec3 fog_color;
 		uniform float pixel_scale;
+		uniform bool flip_y;
 
 		in vec2 uvs;
 		out vec4 f_color;
@@ -61,12 +411,15 @@ class PS1ShaderEffect:
 
 		void main() {
 			vec2 uv = uvs;
+			if (flip_y) {
+				uv.y = 1.0 - uv.y;
+			}
 
 			float jitter_x = (random(vec2(time * 0.1, 0.0)) - 0.5) * jitter_strength * 0.003;
 			float jitter_y = (random(vec2(0.0, time * 0.1)) - 0.5) * jitter_strength * 0.003;
 			uv += vec2(jitter_x, jitter_y);
 
-			vec2 pixel_uv = floor(uv / pixel_scale) * pixel_scale;
+			vec2 pixel_uv = pixel_scale > 0.0 ? floor(uv / pixel_scale) * pixel_scale : uv;
 
 			vec4 color = texture(text, pixel_uv);
 
@@ -88,85 +441,520 @@ class PS1ShaderEffect:
 			[(self.quad_buffer, '2f 2f', 'vert', 'text_cord')]
 		)
 
+		self.overlay_vert_shader = '''
+		#version 330 core
+
+		uniform vec4 rect;
+		uniform vec2 screen;
+
+		in vec2 text_cord;
+		out vec2 uvs;
+
+		void main() {
+			vec2 pos = rect.xy + text_cord * rect.zw;
+			uvs = text_cord;
+			gl_Position = vec4(pos.x / screen.x * 2.0 - 1.0, 1.0 - pos.y / screen.y * 2.0, 0.0, 1.0);
+		}
+		'''
+
+		self.overlay_frag_shader = '''
+		#version 330 core
+
+		uniform sampler2D text;
+
+		in vec2 uvs;
+		out vec4 f_color;
+
+		void main() {
+			f_color = texture(text, uvs);
+		}
+		'''
+
+		self.overlay_program = self.ctx.program(
+			vertex_shader=self.overlay_vert_shader,
+			fragment_shader=self.overlay_frag_shader
+		)
+
+		self.overlay_object = self.ctx.vertex_array(
+			self.overlay_program,
+			[(self.quad_buffer, '8x 2f', 'text_cord')]
+		)
+
+		self.points_vert_shader = '''
+		#version 330 core
+
+		uniform vec2 screen;
+
+		in vec2 point;
+
+		void main() {
+			vec2 pos = point + 0.5;
+			gl_Position = vec4(pos.x / screen.x * 2.0 - 1.0, 1.0 - pos.y / screen.y * 2.0, 0.0, 1.0);
+		}
+		'''
+
+		self.points_frag_shader = '''
+		#version 330 core
+
+		uniform vec4 color;
+
+		out vec4 f_color;
+
+		void main() {
+			f_color = color;
+		}
+		'''
+
+		self.points_program = self.ctx.program(
+			vertex_shader=self.points_vert_shader,
+			fragment_shader=self.points_frag_shader
+		)
+
+		self.points_buffer = self.ctx.buffer(reserve=8 * 1024, dynamic=True)
+		self.points_object = self.ctx.vertex_array(
+			self.points_program,
+			[(self.points_buffer, '2f', 'point')]
+		)
+
+		self.sprite_batch = SpriteBatch(self.ctx, self.quad_buffer)
+
+		self.offscreen_texture = None
+		self.offscreen_fbo = None
+		self.scene_texture = None
+		self.scene_fbo = None
+		self.frame_texture = None
+		self.output_fbo = self.ctx.screen
+		self._output_texture = None
+		self._pixel_buffers = []
+		self._pixel_buffer_index = 0
+		# the surface whose pixels wait in the current pixel buffer
+		self._staged_surface = None
+		self._overlay_textures = OrderedDict()
+		self._max_overlay_textures = 32
+		self.resize(screen_size)
+
 		self.frame_count = 0
 
+	def get_render_scale(self) -> float:
+		if not self.low_res:
+			return 1.0
+		if self.render_scale is not None:
+			return self.render_scale
+		return derive_render_scale(self.resolution_scale, self.screen_size[1])
+
+	def resize(self, size: tuple[int, int]) -> None:
+		self.screen_size = tuple(size)
+		scale = self.get_render_scale()
+		self.render_size = (
+			max(1, round(self.screen_size[0] * scale)),
+			max(1, round(self.screen_size[1] * scale)),
+		)
+
+		self._ensure_offscreen(self.screen_size)
+		self._ensure_frame_texture(self.screen_size)
+		if self.scene_texture is not None:
+			self._ensure_scene(self.render_size)
+		if self.ctx.screen is None:
+			self._ensure_output(self.screen_size)
+
+	def _ensure_output(self, size: tuple[int, int]) -> None:
+		# standalone contexts have no default framebuffer to present into
+		if self._output_texture is not None:
+			if self._output_texture.size == tuple(size):
+				return
+			self.output_fbo.release()
+			self._output_texture.release()
+
+		self._output_texture = self.ctx.texture(size, 4)
+		self.output_fbo = self.ctx.framebuffer(color_attachments=[self._output_texture])
+
+	def _ensure_offscreen(self, size: tuple[int, int]) -> None:
+		if self.offscreen_texture is not None and self.offscreen_texture.size == tuple(size):
+			return
+
+		if self.offscreen_fbo is not None:
+			self.offscreen_fbo.release()
+			self.offscreen_texture.release()
+
+		self.offscreen_texture = self.ctx.texture(size, 4)
+		self.offscreen_texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+		self.offscreen_fbo = self.ctx.framebuffer(color_attachments=[self.offscreen_texture])
+
+	def _ensure_scene(self, size: tuple[int, int]) -> None:
+		# only allocated once the scene is rendered on the GPU
+		if self.scene_texture is not None and self.scene_texture.size == tuple(size):
+			return
+
+		if self.scene_fbo is not None:
+			self.scene_fbo.release()
+			self.scene_texture.release()
+
+		self.scene_texture = self.ctx.texture(size, 4)
+		self.scene_texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+		self.scene_fbo = self.ctx.framebuffer(color_attachments=[self.scene_texture])
+
+	def _ensure_frame_texture(self, size: tuple[int, int]) -> None:
+		if self.frame_texture is not None and self.frame_texture.size == tuple(size):
+			return
+
+		self._release_frame_texture()
+
+		self.frame_texture = self.ctx.texture(size, 4)
+		self.frame_texture.filter = (moderngl.NEAREST, moderngl.NEAREST)
+		self.frame_texture.swizzle = 'BGRA'
+
+		if self.upload_mode == 'pbo':
+			self._pixel_buffers = [
+				self.ctx.buffer(reserve=size[0] * size[1] * 4, dynamic=True)
+				for _ in range(2)
+			]
+			self._pixel_buffer_index = 0
+
+	def _release_frame_texture(self) -> None:
+		if self.frame_texture is not None:
+			self.frame_texture.release()
+			self.frame_texture = None
+
+		for pixel_buffer in self._pixel_buffers:
+			pixel_buffer.release()
+		self._pixel_buffers = []
+		self._staged_surface = None
+
+	def upload_frame(self, surf: pygame.Surface) -> moderngl.Texture:
+		"""returns the frame texture holding `surf`.
+
+		In 'pbo' mode it holds `surf` as of the previous call, unless that call
+		staged another surface or none at all, which is uploaded directly
+		"""
+
+		self._ensure_frame_texture(surf.get_size())
+		data = surface_bytes(surf)
+
+		if self.upload_mode == 'pbo':
+			if self._staged_surface is surf:
+				# the GPU copies last frame's pixels out of one buffer while this frame fills the other
+				self.frame_texture.write(self._pixel_buffers[self._pixel_buffer_index])
+			else:
+				self.frame_texture.write(data)
+
+			self._pixel_buffer_index = 1 - self._pixel_buffer_index
+			pixel_buffer = self._pixel_buffers[self._pixel_buffer_index]
+			# fresh storage, in case the copy out of this buffer two frames ago is still running
+			pixel_buffer.orphan()
+			pixel_buffer.write(data)
+			self._staged_surface = surf
+		else:
+			self.frame_texture.write(data)
+
+		return self.frame_texture
+
 	def surf_to_texture(self, surf: pygame.Surface) -> moderngl.Texture:
 		text = self.ctx.texture(surf.get_size(), 4)
 		text.filter = (moderngl.NEAREST, moderngl.NEAREST)
 		text.swizzle = 'BGRA'
-		text.write(surf.get_view('1'))
+		text.write(surface_bytes(surf))
 		return text
 
-	def process_frame(self, surface: pygame.Surface) -> None:
-		self.frame_count += 1
+	def _overlay_texture(self, surf: pygame.Surface, dirty: bool = False) -> moderngl.Texture:
+		key = id(surf)
+		cached = self._overlay_textures.get(key)
+		if cached is not None and cached[0] is surf:
+			self._overlay_textures.move_to_end(key)
+			if dirty:
+				cached[1].write(surface_bytes(surf))
+			return cached[1]
+
+		if cached is not None:
+			cached[1].release()
 
-		frame_text = self.surf_to_texture(surface)
-		frame_text.use(0)
+		text = self.surf_to_texture(surf)
+		self._overlay_textures[key] = (surf, text)
+		self._overlay_textures.move_to_end(key)
+
+		while len(self._overlay_textures) > self._max_overlay_textures:
+			_, (_, old_text) = self._overlay_textures.popitem(last=False)
+			old_text.release()
+
+		return text
+
+	def configure(self, **settings) -> None:
+		"""changes constructor settings of a live effect and resizes its targets to match"""
+
+		upload_mode = settings.get('upload_mode', self.upload_mode)
+		if upload_mode not in UPLOAD_MODES:
+			raise ValueError(f'Unknown upload mode: {upload_mode}')
+		if upload_mode != self.upload_mode:
+			self._release_frame_texture()
+
+		for name, value in settings.items():
+			if name == 'profiler' and value is None:
+				value = FrameProfiler()
+			setattr(self, name, value)
+
+		self.resize(settings.get('screen_size', self.screen_size))
+
+	def _ps1_pass(self, text: moderngl.Texture, flip_y: bool, pixel_scale: float | None = None) -> None:
+		text.use(0)
 
 		self.program['text'] = 0
 		self.program['time'] = self.frame_count
 		self.program['jitter_strength'] = self.jitter_strength
 		self.program['fog_density'] = self.fog_density
 		self.program['fog_color'] = self.fog_color
-		self.program['pixel_scale'] = self.resolution_scale
+		self.program['pixel_scale'] = self.resolution_scale if pixel_scale is None else pixel_scale
+		self.program['flip_y'] = flip_y
+
+		with self.profiler.scope('ps1_pass'):
+			self.offscreen_fbo.use()
+			self.render_object.render(mode=moderngl.TRIANGLE_STRIP)
+
+	def process_frame(self, surface: pygame.Surface) -> None:
+		self.frame_count += 1
+		self._ensure_offscreen(surface.get_size())
+
+		with self.profiler.scope('upload'):
+			frame_text = self.upload_frame(surface)
+
+		self._ps1_pass(frame_text, False)
+
+	def begin_scene(self, color: tuple[float, float, float]) -> SpriteBatch:
+		"""clears the GPU scene target and returns the batch to fill for this frame"""
+
+		self._ensure_scene(self.render_size)
+		self.scene_fbo.use()
+		self.scene_fbo.clear(*color, 1.0)
+		self.sprite_batch.begin()
+		return self.sprite_batch
+
+	def process_scene(self) -> None:
+		"""draws the batch into the scene target and runs the PS1 pass over it"""
+
+		self.frame_count += 1
+
+		with self.profiler.scope('sprite_batch'):
+			# sprites stay in screen pixels, the viewport maps them onto the smaller target
+			self.sprite_batch.draw(self.scene_fbo, self.screen_size)
+
+		# the scene was rendered bottom-up, unlike uploaded surfaces. A low
+		# resolution target is already blocky, so it is upscaled by nearest
+		# sampling alone instead of quantizing the coordinates again
+		self._ps1_pass(self.scene_texture, True, 0.0 if self.render_size != self.screen_size else None)
+
+	def draw_points(
+		self,
+		points: bytes,
+		count: int,
+		color: tuple[float, float, float, float] = (1.0, 1.0, 1.0, 1.0),
+	) -> None:
+		if count <= 0:
+			return
+
+		if self.points_buffer.size < len(points):
+			self.points_buffer.orphan(len(points))
+		self.points_buffer.write(points)
+
+		self.points_program['screen'] = self.offscreen_texture.size
+		self.points_program['color'] = color
+
+		self.offscreen_fbo.use()
+		self.points_object.render(mode=moderngl.POINTS, vertices=count)
+
+	def draw_overlay(self, surf: pygame.Surface, pos: tuple[int, int], dirty: bool = False) -> None:
+		"""`dirty` re-uploads a surface whose pixels changed since it was last drawn"""
+
+		text = self._overlay_texture(surf, dirty)
+		text.use(0)
+
+		self.overlay_program['text'] = 0
+		self.overlay_program['rect'] = (pos[0], pos[1], *surf.get_size())
+		self.overlay_program['screen'] = self.offscreen_texture.size
+
+		self.offscreen_fbo.use()
+		self.ctx.enable(moderngl.BLEND)
+		self.overlay_object.render(mode=moderngl.TRIANGLE_STRIP)
+		self.ctx.disable(moderngl.BLEND)
+
+	def _present_texture(self, text: moderngl.Texture, flip_y: bool, plain: bool = False) -> None:
+		text.use(0)
+
+		self.program['text'] = 0
+		self.program['time'] = 0
+		self.program['jitter_strength'] = 0.0
+		self.program['fog_density'] = 0.0 if plain else self.fog_density
+		self.program['fog_color'] = self.fog_color
+		self.program['pixel_scale'] = 0.0 if plain else 0.001
+		self.program['flip_y'] = flip_y
 
+		self.output_fbo.use()
 		self.render_object.render(mode=moderngl.TRIANGLE_STRIP)
 
-		frame_text.release()
+	def present(self) -> None:
+		self._present_texture(self.offscreen_texture, True)
+
+	def present_surface(self, surface: pygame.Surface) -> None:
+		self._present_texture(self.upload_frame(surface), False)
+
+	def present_plain(self, surface: pygame.Surface) -> None:
+		"""presents `surface` as is, without pixelation or fog, used for the menus"""
+
+		self._present_texture(self.upload_frame(surface), False, plain=True)
 
 	def get_screen_size(self) -> tuple[int, int]:
+		if self.ctx.screen is None:
+			return self.screen_size
 		return (self.ctx.screen.width, self.ctx.screen.height)
 
 	def cleanup(self):
+		for _, text in self._overlay_textures.values():
+			text.release()
+		self._overlay_textures.clear()
+		self._release_frame_texture()
+		self.sprite_batch.release()
+		if self.scene_fbo is not None:
+			self.scene_fbo.release()
+			self.scene_texture.release()
+		if self._output_texture is not None:
+			self.output_fbo.release()
+			self._output_texture.release()
+		self.offscreen_fbo.release()
+		self.offscreen_texture.release()
 		self.quad_buffer.release()
+		self.points_buffer.release()
 		self.render_object.release()
+		self.overlay_object.release()
+		self.points_object.release()
 		self.program.release()
+		self.overlay_program.release()
+		self.points_program.release()
 		self.ctx.release()
 
 
+class DisplaySession:
+	"""the window, GL context and `PS1ShaderEffect` shared by the menu and every game run.
+
+	Opening a session that is already open only changes the caption, so going
+	from the menu to a game or restarting a level keeps the window, the context,
+	the compiled programs and all GPU buffers
+	"""
+
+	def __init__(self) -> None:
+		self.size = None
+		self.screen = None
+		self.effect = None
+		self.mode_changes = 0
+
+	@property
+	def is_open(self) -> bool:
+		return self.screen is not None and pygame.display.get_init() and pygame.display.get_surface() is self.screen
+
+	def _set_mode(self) -> None:
+		self.mode_changes += 1
+		if is_headless():
+			self.screen = pygame.display.set_mode(self.size)
+			return
+
+		self.screen = pygame.display.set_mode(
+			self.size,
+			pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN,
+			vsync=1
+		)
+
+	def open(self, title: str = 'PyGame', size: tuple[int, int] | None = None) -> pygame.Surface:
+		"""opens the window at `size`, the desktop size by default, or resizes the open one to it"""
+
+		if not self.is_open:
+			self.close()
+			pygame.display.init()
+			if size is None:
+				info = pygame.display.Info()
+				size = (info.current_w, info.current_h)
+			self.size = tuple(size)
+			self._set_mode()
+		elif size is not None and tuple(size) != self.size:
+			self.resize(size)
+
+		pygame.display.set_caption(title)
+		return self.screen
+
+	def resize(self, size: tuple[int, int]) -> pygame.Surface:
+		self.size = tuple(size)
+		self._set_mode()
+		if self.effect is not None:
+			self.effect.resize(self.size)
+		return self.screen
+
+	def get_effect(self, **settings) -> PS1ShaderEffect:
+		"""returns the shared effect, created on first use and reconfigured with `settings` after that"""
+
+		if self.effect is None:
+			settings.setdefault('screen_size', self.size)
+			self.effect = PS1ShaderEffect(ctx=create_headless_context() if is_headless() else None, **settings)
+		elif settings:
+			self.effect.configure(**settings)
+		return self.effect
+
+	def present(self, surface: pygame.Surface) -> None:
+		self.get_effect().present_plain(surface)
+		pygame.display.flip()
+
+	def close(self) -> None:
+		if self.effect is not None:
+			self.effect.cleanup()
+			self.effect = None
+		self.screen = None
+		if pygame.display.get_init():
+			pygame.display.quit()
+
+
+display_session = DisplaySession()
+
+
 def ps1_shader(
 	resolution_scale: float = 0.003,
 	jitter_strength: float = 0.3,
 	fog_density: float = 0.2,
 	fog_color: tuple[float, float, float] = (0.35, 0.35, 0.43),
+	upload_mode: str = 'pbo',
+	sprite_batching: bool = True,
+	low_res: bool = False,
+	render_scale: float | None = None,
 ) -> Callable:
+	"""renders the decorated game through `PS1ShaderEffect`.
+
+	`low_res` draws the batched scene into a target scaled by `render_scale`,
+	which defaults to one pixel per PS1 block (see `derive_render_scale`)
+	"""
+
 	def decorator(cls):
 		original_init = cls.__init__
 		original_quit = cls.quit
 
+		def new_init_display(self, title: str) -> None:
+			self._screen = display_session.open(title, self.size)
+
 		def new_init(self, *args, **kwargs):
 			original_init(self, *args, **kwargs)
 
-			pygame.display.quit()
-			pygame.display.init()
-
-			info = pygame.display.Info()
-			self.size = (info.current_w, info.current_h)
-
-			flags = pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN
+			self.size = display_session.size
+			self._display = pygame.Surface(self.size, 0, 32)
 
-			self._screen = pygame.display.set_mode(
-				self.size, 
-				flags,
-				vsync=1
-			)
-			pygame.display.set_caption(kwargs.get('title', 'PyGame'))
-
-			self._display = pygame.Surface(self.size)
-
-			self._shader_effect = PS1ShaderEffect(
+			self._shader_effect = display_session.get_effect(
 				screen_size=self.size,
 				resolution_scale=resolution_scale,
 				jitter_strength=jitter_strength,
 				fog_density=fog_density,
 				fog_color=fog_color,
+				upload_mode=upload_mode,
+				profiler=self.profiler,
+				low_res=low_res,
+				render_scale=render_scale,
 			)
+			self._profiler_surface = None
 			self._shader_enabled = True
+			self._sprite_batching = sprite_batching
 
 			if kwargs.get('enable_snow', False) and kwargs.get('snow_density'):
-				from .snow import create_snow
-				cam_offset = self._camera.get_offset() if self._camera else (0, 0)
-				self._snow_particles = create_snow(kwargs['snow_density'], self.size[0], self.size[1], cam_offset)
+				self._spawn_snow()
 
 			if self._camera is not None:
 				self._camera.update_screen_size(self.size[0], self.size[1])
@@ -174,14 +962,8 @@ def ps1_shader(
 		def new_handle_resize(self, new_width: int, new_height: int) -> None:
 			self.size = (new_width, new_height)
 
-			flags = pygame.OPENGL | pygame.DOUBLEBUF | pygame.FULLSCREEN
-
-			self._screen = pygame.display.set_mode(
-				self.size,
-				flags,
-				vsync=1
-			)
-			self._display = pygame.Surface(self.size)
+			self._screen = display_session.resize(self.size)
+			self._display = pygame.Surface(self.size, 0, 32)
 			self.physics_world.screen_height = new_height
 
 			if self._camera is not None:
@@ -191,19 +973,15 @@ def ps1_shader(
 				if hasattr(sprite, '_update_sprite_position'):
 					sprite._update_sprite_position()
 
-		def new_render(self):
-			actual_size = self._shader_effect.get_screen_size()
-
-			if self._display.get_size() != actual_size:
-				self._display = pygame.Surface(actual_size)
+			if hasattr(self._platform_group, 'rebuild'):
+				self._platform_group.rebuild()
+			if self._static_layer is not None:
+				self._static_layer.clear()
 
+		def render_scene(self, cam_offset: tuple[int, int]) -> None:
 			self._display.fill(self._bg)
 
-			for platform in self._platform_group:
-				if self._camera is not None:
-					self._display.blit(platform.image, self._camera.apply(platform.rect))
-				else:
-					self._display.blit(platform.image, platform.rect)
+			self._draw_platforms(self._display)
 
 			if self._camera is not None:
 				left_rect = self._camera.apply(self._player._left_part.rect)
@@ -217,115 +995,116 @@ def ps1_shader(
 				self._display.blit(self._player._bag.image, self._player._bag.rect)
 				self._display.blit(self._player._right_part.image, self._player._right_part.rect)
 
-			if self._debris_particles is not None:
-				debris_sorted = sorted(self._debris_particles, key=lambda obj: obj.depth)
-				for debris in debris_sorted:
-					if self._camera is not None:
-						debris_rect = pygame.Rect(
-							int(debris._x - debris._width / 2),
-							int(debris._y - debris._height / 2),
-							debris._width,
-							debris._height
-						)
-						adjusted_rect = self._camera.apply(debris_rect)
-						self._display.blit(debris._surface, adjusted_rect.topleft)
-					else:
-						self._display.blit(
-							debris._surface,
-							(
-								int(debris._x - debris._width / 2),
-								int(debris._y - debris._height / 2)
-							)
-						)
-
-			if self._confetti_particles is not None:
-				confetti_sorted = sorted(self._confetti_particles, key=lambda obj: obj.depth)
-				for confetto in confetti_sorted:
-					if self._camera is not None:
-						confetto_rect = pygame.Rect(
-							int(confetto._x - confetto._width / 2),
-							int(confetto._y - confetto._height / 2),
-							confetto._width,
-							confetto._height
-						)
-						adjusted_rect = self._camera.apply(confetto_rect)
-						self._display.blit(confetto._surface, adjusted_rect.topleft)
-					else:
-						self._display.blit(
-							confetto._surface,
-							(
-								int(confetto._x - confetto._width / 2),
-								int(confetto._y - confetto._height / 2)
-							)
-						)
+			self._debris_particles.draw(self._display, cam_offset)
+			self._confetti_particles.draw(self._display, cam_offset)
 
-			use_shader = self._shader_enabled and not (hasattr(self, '_paused') and self._paused)
+		def batch_scene(self, cam_offset: tuple[int, int]) -> None:
+			color = pygame.Color(self._bg)
+			batch = self._shader_effect.begin_scene((color.r / 255, color.g / 255, color.b / 255))
+			ox, oy = cam_offset
 
-			if use_shader:
-				self._shader_effect.process_frame(self._display)
-				self._shader_effect.ctx.finish()
+			for platform in self.get_visible_platforms():
+				batch.add_surface(platform.image, (platform.rect.x - ox, platform.rect.y - oy))
 
-				buffer_data = self._shader_effect.ctx.screen.read(components=4)
-				result_surface = pygame.image.fromstring(buffer_data, actual_size, 'RGBA', True)
+			for part in (self._player._left_part, self._player._bag, self._player._right_part):
+				batch.add_surface(part.image, (part.rect.x - ox, part.rect.y - oy))
 
-				temp_screen = pygame.Surface(actual_size)
-				temp_screen.blit(result_surface, (0, 0))
-			else:
-				temp_screen = self._display.copy()
+			batch.add_quads(*self._debris_particles.get_quads(cam_offset))
+			batch.add_quads(*self._confetti_particles.get_quads(cam_offset))
+
+		def profiler_overlay(self) -> pygame.Surface:
+			size = self.profiler.get_overlay_size()
+			if self._profiler_surface is None or self._profiler_surface.get_size() != size:
+				self._profiler_surface = pygame.Surface(size, pygame.SRCALPHA)
+
+			self._profiler_surface.fill((0, 0, 0, 0))
+			self.profiler.draw(self._profiler_surface, (0, 0))
+			return self._profiler_surface
+
+		def render_frame(self):
+			actual_size = self._shader_effect.get_screen_size()
+
+			if self._display.get_size() != actual_size:
+				self._display = pygame.Surface(actual_size, 0, 32)
+				self._shader_effect.resize(actual_size)
+
+			cam_offset = self._camera.get_offset() if self._camera is not None else (0, 0)
+			use_shader = self._shader_enabled and not (hasattr(self, '_paused') and self._paused)
+			use_batching = use_shader and self._sprite_batching
+
+			with self.profiler.scope('scene'):
+				if use_batching:
+					batch_scene(self, cam_offset)
+				else:
+					render_scene(self, cam_offset)
 
 			if self._snow_particles is not None:
-				from .snow import update_snow
-				cam_offset = self._camera.get_offset() if self._camera is not None else (0, 0)
-				update_snow(self._snow_particles, cam_offset, actual_size[0], actual_size[1])
-
-				for snowflake in self._snow_particles:
-					snow_x = int(snowflake.x - cam_offset[0])
-					snow_y = int(snowflake.y - cam_offset[1])
-					if 0 <= snow_x < actual_size[0] and 0 <= snow_y < actual_size[1]:
-						temp_screen.set_at((snow_x, snow_y), '#ffffff')
-
-				cam_offset = self._camera.get_offset() if self._camera is not None else (0, 0)
-				for snowflake in self._snow_particles:
-					snow_x = int(snowflake.x - cam_offset[0])
-					snow_y = int(snowflake.y - cam_offset[1])
-					if 0 <= snow_x < actual_size[0] and 0 <= snow_y < actual_size[1]:
-						temp_screen.set_at((snow_x, snow_y), '#ffffff')
-
-			if hasattr(self, '_paused') and self._paused and hasattr(self, '_pause_menu') and self._pause_menu:
-				self._pause_menu.draw(temp_screen)
+				self._snow_particles.update(cam_offset, actual_size[0], actual_size[1])
+
+			overlays = []
 
 			if self._is_game_over:
-				font = pygame.font.SysFont('', 56)
-				text = font.render('ПРОИГРЫШ - Нажми R или ESC/M для меню', True, '#ff0000')
+				text = text_cache.render('ПРОИГРЫШ - Нажми R или ESC/M для меню', 56, '#ff0000')
 				text_rect = text.get_rect(center=(actual_size[0] // 2, actual_size[1] // 2))
-				temp_screen.blit(text, text_rect)
+				overlays.append((text, text_rect.topleft, False))
 
 			if self._is_victory:
-				font = pygame.font.SysFont('', 56)
-				text = font.render('ПОБЕДА! - Нажми R или ESC/M для меню', True, '#00ff00')
+				text = text_cache.render('ПОБЕДА! - Нажми R или ESC/M для меню', 56, '#00ff00')
 				text_rect = text.get_rect(center=(actual_size[0] // 2, actual_size[1] // 2))
-				temp_screen.blit(text, text_rect)
+				overlays.append((text, text_rect.topleft, False))
 
 			if self._show_fps:
-				from .game import render_fps_counter
-				render_fps_counter(temp_screen, self._clock)
+				from .game import fps_counter_surface
+				overlays.append((fps_counter_surface(self._clock), (4, 4), False))
+
+			if self._show_profiler:
+				overlays.append((profiler_overlay(self), (4, 28), True))
+
+			if use_shader:
+				if use_batching:
+					self._shader_effect.process_scene()
+				else:
+					self._shader_effect.process_frame(self._display)
+
+				with self.profiler.scope('overlays'):
+					if self._snow_particles is not None:
+						snow_x, snow_y = self._snow_particles.get_screen_points(cam_offset, *actual_size)
+						snow_points = np.column_stack((snow_x, snow_y)).astype(np.float32)
+						self._shader_effect.draw_points(snow_points.tobytes(), len(snow_points))
+
+					for surface, pos, dirty in overlays:
+						self._shader_effect.draw_overlay(surface, pos, dirty)
+
+				with self.profiler.scope('present'):
+					self._shader_effect.present()
+			else:
+				if self._snow_particles is not None:
+					self._snow_particles.draw(self._display, cam_offset)
+
+				if hasattr(self, '_paused') and self._paused and hasattr(self, '_pause_menu') and self._pause_menu:
+					self._pause_menu.draw(self._display)
+
+				for surface, pos, _ in overlays:
+					self._display.blit(surface, pos)
+
+				with self.profiler.scope('present'):
+					self._shader_effect.present_surface(self._display)
+
+		def new_render(self):
+			with self.profiler.scope('render'):
+				render_frame(self)
 
-			final_text = self._shader_effect.surf_to_texture(temp_screen)
-			final_text.use(0)
-			self._shader_effect.program['text'] = 0
-			self._shader_effect.program['time'] = 0
-			self._shader_effect.program['jitter_strength'] = 0.0
-			self._shader_effect.program['pixel_scale'] = 0.001
-			self._shader_effect.render_object.render(mode=moderngl.TRIANGLE_STRIP)
-			final_text.release()
+			with self.profiler.scope('flip'):
+				pygame.display.flip()
 
-			pygame.display.flip()
+			self.profiler.end_frame()
 
 		def new_quit(self):
-			self._shader_effect.cleanup()
+			display_session.close()
 			original_quit(self)
 
 		cls.__init__ = new_init
+		cls._init_display = new_init_display
 		cls.render = new_render
 		cls.quit = new_quit
 		cls._handle_resize = new_handle_resize
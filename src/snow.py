@@ -1,48 +1,79 @@
-import random
+import numpy as np
+import pygame
 
 
-class Snowflake:
-	def __init__(self, x: float, y: float, velocity: float, screen_width: int):
-		self.x = x
-		self.y = y
-		self.velocity = velocity
-		self.screen_width = screen_width
+class SnowField:
+	def __init__(
+		self,
+		density: int,
+		screen_width: int,
+		screen_height: int,
+		camera_offset: tuple[int, int] = (0, 0),
+		seed: int | None = None,
+	) -> None:
+		self._rng = np.random.default_rng(seed)
 
-	def update(self):
-		self.y += self.velocity
+		cam_left = camera_offset[0]
+		cam_right = camera_offset[0] + screen_width
+		cam_top = camera_offset[1] - 100
+		cam_bottom = camera_offset[1] + screen_height
+
+		self.x = self._rng.uniform(cam_left, cam_right, density)
+		self.y = self._rng.uniform(cam_top, cam_bottom, density)
+		self.velocity = self._rng.uniform(0.5, 2.0, density)
 
-	def should_respawn(self, camera_top: float, camera_bottom: float) -> bool:
-		return self.y > camera_bottom
+	def __len__(self) -> int:
+		return len(self.x)
 
-	def respawn(self, camera_left: float, camera_right: float, camera_top: float):
-		self.x = random.uniform(camera_left, camera_right)
-		self.y = camera_top - random.uniform(10, 50)
+	def snapshot(self) -> dict:
+		return {
+			'x': self.x.copy(),
+			'y': self.y.copy(),
+			'velocity': self.velocity.copy(),
+			'rng': self._rng.bit_generator.state,
+		}
 
+	def restore(self, snapshot: dict) -> None:
+		self.x = snapshot['x'].copy()
+		self.y = snapshot['y'].copy()
+		self.velocity = snapshot['velocity'].copy()
+		self._rng.bit_generator.state = snapshot['rng']
 
-def create_snow(density: int, screen_width: int, screen_height: int, camera_offset: tuple[int, int]):
-	snowflakes = []
-	cam_left = camera_offset[0]
-	cam_right = camera_offset[0] + screen_width
-	cam_top = camera_offset[1] - 100
-	cam_bottom = camera_offset[1] + screen_height
+	def update(self, camera_offset: tuple[int, int], screen_width: int, screen_height: int) -> None:
+		cam_left = camera_offset[0]
+		cam_right = camera_offset[0] + screen_width
+		cam_top = camera_offset[1]
+		cam_bottom = camera_offset[1] + screen_height
 
-	for _ in range(density):
-		x = random.uniform(cam_left, cam_right)
-		y = random.uniform(cam_top, cam_bottom)
-		velocity = random.uniform(0.5, 2.0)
-		snowflakes.append(Snowflake(x, y, velocity, screen_width))
+		self.y += self.velocity
 
-	return snowflakes
+		respawn = self.y > cam_bottom
+		count = np.count_nonzero(respawn)
+		if count:
+			self.x[respawn] = self._rng.uniform(cam_left, cam_right, count)
+			self.y[respawn] = cam_top - self._rng.uniform(10, 50, count)
 
+	def get_screen_points(
+		self,
+		camera_offset: tuple[int, int],
+		screen_width: int,
+		screen_height: int,
+	) -> tuple[np.ndarray, np.ndarray]:
+		snow_x = (self.x - camera_offset[0]).astype(np.int32)
+		snow_y = (self.y - camera_offset[1]).astype(np.int32)
 
-def update_snow(snowflakes: list, camera_offset: tuple[int, int], screen_width: int, screen_height: int):
-	cam_left = camera_offset[0]
-	cam_right = camera_offset[0] + screen_width
-	cam_top = camera_offset[1]
-	cam_bottom = camera_offset[1] + screen_height
+		visible = (snow_x >= 0) & (snow_x < screen_width) & (snow_y >= 0) & (snow_y < screen_height)
+		return snow_x[visible], snow_y[visible]
 
-	for snowflake in snowflakes:
-		snowflake.update()
+	def draw(self, surface: pygame.Surface, camera_offset: tuple[int, int], color: str = '#ffffff') -> None:
+		snow_x, snow_y = self.get_screen_points(camera_offset, *surface.get_size())
+		if not len(snow_x):
+			return
 
-		if snowflake.should_respawn(cam_top, cam_bottom):
-			snowflake.respawn(cam_left, cam_right, cam_top)
+		if surface.get_bytesize() == 3:
+			pixels = pygame.surfarray.pixels3d(surface)
+			pixels[snow_x, snow_y] = pygame.Color(color)[:3]
+		else:
+			pixels = pygame.surfarray.pixels2d(surface)
+			pixels[snow_x, snow_y] = surface.map_rgb(pygame.Color(color))
+		del pixels
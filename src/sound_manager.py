@@ -8,6 +8,11 @@ class SoundManager:
 		self._music_volume = 0.7
 		self._sfx_volume = 0.5
 
+	def set_sound(self, name: str, sound: pygame.mixer.Sound | None) -> None:
+		if sound is not None:
+			sound.set_volume(self._sfx_volume)
+		self._sounds[name] = sound
+
 	def load_sound(self, name: str, path: str) -> None:
 		try:
 			sound = pygame.mixer.Sound(path)
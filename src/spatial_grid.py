@@ -0,0 +1,116 @@
+import pygame
+
+
+class SpatialGrid:
+	"""uniform grid over sprite rects for fast rectangle queries.
+
+	Each sprite is stored in every cell its rect overlaps. Rects are read when
+	a sprite is inserted, so `rebuild` has to be called after sprites move
+	"""
+
+	def __init__(self, cell_size: int = 256) -> None:
+		self._cell_size = cell_size
+		self._cells = {}
+		self._sprite_cells = {}
+		self._order = {}
+		self._next_order = 0
+
+	def __len__(self) -> int:
+		return len(self._sprite_cells)
+
+	def __contains__(self, sprite) -> bool:
+		return sprite in self._sprite_cells
+
+	def _cell_range(self, rect: pygame.Rect) -> tuple[int, int, int, int]:
+		size = self._cell_size
+		return (
+			rect.left // size,
+			rect.top // size,
+			(rect.right - 1) // size,
+			(rect.bottom - 1) // size,
+		)
+
+	def insert(self, sprite) -> None:
+		if sprite in self._sprite_cells:
+			self.remove(sprite)
+
+		left, top, right, bottom = self._cell_range(sprite.rect)
+		keys = [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
+		for key in keys:
+			self._cells.setdefault(key, []).append(sprite)
+
+		self._sprite_cells[sprite] = keys
+		self._order[sprite] = self._next_order
+		self._next_order += 1
+
+	def remove(self, sprite) -> None:
+		keys = self._sprite_cells.pop(sprite, None)
+		if keys is None:
+			return
+
+		del self._order[sprite]
+		for key in keys:
+			cell = self._cells[key]
+			cell.remove(sprite)
+			if not cell:
+				del self._cells[key]
+
+	def clear(self) -> None:
+		self._cells.clear()
+		self._sprite_cells.clear()
+		self._order.clear()
+		self._next_order = 0
+
+	def rebuild(self, sprites) -> None:
+		self.clear()
+		for sprite in sprites:
+			self.insert(sprite)
+
+	def query(self, rect: pygame.Rect) -> list:
+		"""returns sprites whose rects collide with `rect`, in insertion order"""
+
+		cells = self._cells
+		left, top, right, bottom = self._cell_range(rect)
+		found = {}
+
+		if (right - left + 1) * (bottom - top + 1) > len(cells):
+			# huge query rects are cheaper to answer by walking the occupied cells
+			for (x, y), cell in cells.items():
+				if left <= x <= right and top <= y <= bottom:
+					for sprite in cell:
+						found[sprite] = None
+		else:
+			for x in range(left, right + 1):
+				for y in range(top, bottom + 1):
+					cell = cells.get((x, y))
+					if cell is not None:
+						for sprite in cell:
+							found[sprite] = None
+
+		colliderect = rect.colliderect
+		order = self._order
+		return sorted((sprite for sprite in found if colliderect(sprite.rect)), key=order.__getitem__)
+
+
+class SpatialGroup(pygame.sprite.Group):
+	"""sprite group that keeps its sprites in a `SpatialGrid`"""
+
+	def __init__(self, *sprites, cell_size: int = 256) -> None:
+		self.grid = SpatialGrid(cell_size)
+		super().__init__(*sprites)
+
+	def add_internal(self, sprite, layer=None) -> None:
+		super().add_internal(sprite, layer)
+		self.grid.insert(sprite)
+
+	def remove_internal(self, sprite) -> None:
+		super().remove_internal(sprite)
+		self.grid.remove(sprite)
+
+	def query(self, rect: pygame.Rect) -> list:
+		return self.grid.query(rect)
+
+	def rebuild(self) -> None:
+		"""re-indexes every sprite, has to be called after sprites are moved"""
+
+		self.grid.rebuild(self.sprites())
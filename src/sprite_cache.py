@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+import numpy as np
+import pygame
+
+
+class SpriteCache:
+	"""LRU cache of pre-scaled and pre-rotated solid rectangles.
+
+	Angles and depth scales are quantized, so particles of the same colour
+	and size share a small set of surfaces. Alpha is not part of the key and
+	has to be applied at draw time
+	"""
+
+	def __init__(
+		self,
+		memory_budget: int = 32 * 1024 * 1024,
+		angle_step: float = 5.0,
+		z_step: float = 0.05,
+	) -> None:
+		self._sprites = OrderedDict()
+		self._memory_budget = memory_budget
+		self._memory_used = 0
+		self._angle_step = angle_step
+		self._angle_steps = max(1, round(360 / angle_step))
+		self._z_step = z_step
+		self.hits = 0
+		self.misses = 0
+
+	def __len__(self) -> int:
+		return len(self._sprites)
+
+	@property
+	def memory_used(self) -> int:
+		return self._memory_used
+
+	def set_memory_budget(self, memory_budget: int) -> None:
+		self._memory_budget = memory_budget
+		self._evict()
+
+	def clear(self) -> None:
+		self._sprites.clear()
+		self._memory_used = 0
+
+	def _evict(self) -> None:
+		while self._memory_used > self._memory_budget and len(self._sprites) > 1:
+			_, sprite = self._sprites.popitem(last=False)
+			self._memory_used -= sprite.get_width() * sprite.get_height() * 4
+
+	def quantize_angles(self, angles: np.ndarray) -> np.ndarray:
+		return np.round(angles / self._angle_step).astype(np.int64) % self._angle_steps
+
+	def quantize_depths(self, depths: np.ndarray) -> np.ndarray:
+		return np.round(depths / self._z_step).astype(np.int64)
+
+	def get(
+		self,
+		color: tuple[int, int, int, int],
+		width: int,
+		height: int,
+		angle_index: int,
+		z_index: int,
+	) -> pygame.Surface:
+		"""`angle_index` of -1 means an unrotated sprite"""
+
+		key = (color, width, height, angle_index, z_index)
+
+		sprite = self._sprites.get(key)
+		if sprite is not None:
+			self._sprites.move_to_end(key)
+			self.hits += 1
+			return sprite
+
+		self.misses += 1
+
+		scale = z_index * self._z_step
+		size = (max(1, int(width * scale)), max(1, int(height * scale)))
+		sprite = pygame.Surface(size, pygame.SRCALPHA)
+		sprite.fill(color)
+		if angle_index >= 0:
+			sprite = pygame.transform.rotate(sprite, angle_index * self._angle_step)
+
+		self._sprites[key] = sprite
+		self._memory_used += sprite.get_width() * sprite.get_height() * 4
+		self._evict()
+		return sprite
+
+
+sprite_cache = SpriteCache()
@@ -0,0 +1,136 @@
+from collections import OrderedDict
+
+import pygame
+
+
+# candidates for the colour marking the transparent parts of a chunk, the first one
+# no platform image of the chunk uses is taken
+CHUNK_COLORKEYS = ((255, 0, 255), (0, 255, 255), (255, 255, 0), (1, 254, 1))
+
+
+def _pick_colorkey(images) -> tuple[int, int, int] | None:
+	"""the first of `CHUNK_COLORKEYS` none of `images` has a pixel of, alpha aside"""
+
+	for color in CHUNK_COLORKEYS:
+		if not any(pygame.mask.from_threshold(image, color, (1, 1, 1, 255)).count() for image in images):
+			return color
+	return None
+
+
+class StaticLayer:
+	"""static platforms pre-rendered into large chunk surfaces.
+
+	Chunks are baked lazily when they come into view (one ring of neighbouring
+	chunks is prefetched a few at a time) and evicted in LRU order, keeping at
+	least every chunk of the current view. Chunks use a
+	run-length encoded colorkey instead of per-pixel alpha, so their empty
+	parts cost almost nothing to blit. Only a chunk whose platforms use every
+	colorkey candidate falls back to per-pixel alpha. Call `invalidate` when a platform image
+	changes and `clear` when platforms move
+	"""
+
+	def __init__(
+		self,
+		platform_group: pygame.sprite.AbstractGroup,
+		chunk_size: int = 512,
+		max_chunks: int = 48,
+		prefetch_per_frame: int = 1,
+	) -> None:
+		self._platform_group = platform_group
+		self._chunk_size = chunk_size
+		self._max_chunks = max_chunks
+		# grows past `max_chunks` when a large view covers more chunks than that
+		self._capacity = max_chunks
+		self._prefetch_per_frame = prefetch_per_frame
+		self._chunks = OrderedDict()
+		self.bakes = 0
+
+	def __len__(self) -> int:
+		return len(self._chunks)
+
+	def clear(self) -> None:
+		self._chunks.clear()
+
+	def invalidate(self, rect: pygame.Rect) -> None:
+		"""drops every chunk that overlaps `rect` in world pixels"""
+
+		for key in self._chunk_keys(rect):
+			self._chunks.pop(key, None)
+
+	def _chunk_keys(self, rect: pygame.Rect) -> list[tuple[int, int]]:
+		size = self._chunk_size
+		return [
+			(x, y)
+			for y in range(rect.top // size, (rect.bottom - 1) // size + 1)
+			for x in range(rect.left // size, (rect.right - 1) // size + 1)
+		]
+
+	def _platforms_in(self, rect: pygame.Rect) -> list:
+		if hasattr(self._platform_group, 'query'):
+			return self._platform_group.query(rect)
+		return [sprite for sprite in self._platform_group if rect.colliderect(sprite.rect)]
+
+	def _bake(self, key: tuple[int, int], target: pygame.Surface) -> pygame.Surface | None:
+		size = self._chunk_size
+		chunk_rect = pygame.Rect(key[0] * size, key[1] * size, size, size)
+		platforms = self._platforms_in(chunk_rect)
+		self.bakes += 1
+		if not platforms:
+			return None
+
+		colorkey = _pick_colorkey({id(platform.image): platform.image for platform in platforms}.values())
+		if colorkey is None:
+			chunk = pygame.Surface((size, size), pygame.SRCALPHA, 32)
+			chunk.fill((0, 0, 0, 0))
+		else:
+			chunk = pygame.Surface((size, size), 0, target)
+			chunk.fill(colorkey)
+		chunk.blits(
+			[(platform.image, platform.rect.move(-chunk_rect.x, -chunk_rect.y)) for platform in platforms],
+			False
+		)
+		if colorkey is not None:
+			chunk.set_colorkey(colorkey, pygame.RLEACCEL)
+		return chunk
+
+	def _get(self, key: tuple[int, int], target: pygame.Surface) -> pygame.Surface | None:
+		chunks = self._chunks
+		if key in chunks:
+			chunks.move_to_end(key)
+			return chunks[key]
+
+		chunk = chunks[key] = self._bake(key, target)
+		while len(chunks) > self._capacity:
+			chunks.popitem(last=False)
+		return chunk
+
+	def _prefetch(self, view_rect: pygame.Rect, target: pygame.Surface) -> None:
+		size = self._chunk_size
+		keys = self._chunk_keys(view_rect.inflate(size * 2, size * 2))
+		if len(keys) > self._capacity:
+			# the ring would evict itself, so only the visible chunks are kept
+			return
+
+		budget = self._prefetch_per_frame
+		for key in keys:
+			if budget <= 0:
+				return
+			if key not in self._chunks:
+				self._get(key, target)
+				budget -= 1
+
+	def draw(self, surface: pygame.Surface, view_rect: pygame.Rect) -> None:
+		"""blits the chunks covering `view_rect`, which is in world pixels"""
+
+		size = self._chunk_size
+		keys = self._chunk_keys(view_rect)
+		# baking a visible chunk must never evict another one drawn in the same call
+		self._capacity = max(self._max_chunks, len(keys))
+		blits = []
+		for key in keys:
+			chunk = self._get(key, surface)
+			if chunk is not None:
+				blits.append((chunk, (key[0] * size - view_rect.x, key[1] * size - view_rect.y)))
+		surface.blits(blits, False)
+
+		self._prefetch(view_rect, surface)
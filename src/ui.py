@@ -2,6 +2,8 @@ from collections.abc import Callable
 
 import pygame
 
+from .fonts import text_cache
+
 
 pygame.init()
 
@@ -142,11 +144,7 @@ class Button(UI):
 	def _blit_text(self) -> None:
 		if (not self._text) or (self._foreground is None):
 			return
-		if self._font_name is not None:
-			font = pygame.font.Font(self._font_name, self._font_size)
-		else:
-			font = pygame.font.SysFont('', self._font_size)
-		surface = font.render(self._text, True, self._foreground)
+		surface = text_cache.render(self._text, self._font_size, self._foreground, self._font_name)
 		width, height = surface.get_size()
 		self._original.blit(
 			surface,
@@ -338,11 +336,7 @@ class Text(UI):
 	def _blit_text(self) -> None:
 		if (not self._text) or (self._foreground is None):
 			return
-		if self._font_name is not None:
-			font = pygame.font.Font(self._font_name, self._font_size)
-		else:
-			font = pygame.font.SysFont('', self._font_size)
-		surface = font.render(self._text, True, self._foreground)
+		surface = text_cache.render(self._text, self._font_size, self._foreground, self._font_name)
 		width, height = surface.get_size()
 		self._original.blit(
 			surface,